@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+
+"""Benchmark suite for the core data structures of this project.
+
+Every benchmark is a setup function that builds its data and returns a callable without
+arguments; only calling that callable is timed. Results are seconds per call (the best of
+several repeats, since the minimum is the measurement least disturbed by other processes).
+They can be saved as a baseline file (JSON) and later runs can be compared against it."""
+
+import argparse
+import contextlib
+import io
+import json
+import pickle
+import platform
+import random
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from mastering_oop.cards.card_factory_class import make_card
+from mastering_oop.cards.deck import DeckExtended
+from mastering_oop.cards.suit import Suit
+from mastering_oop.hands.hand import Hand, HandEagerProperty, HandLazyProperty
+from mastering_oop.serialisation import streaming_json
+from mastering_oop.serialisation.persistent_classes import Blog_x, Post, travel_x
+from mastering_oop.strategies.grouped_stats import GroupedStats
+from mastering_oop.strategies.rolling_stats_list import RollingStatsList
+from mastering_oop.strategies.sketches import KLLSketch, LogBinHistogram
+from mastering_oop.strategies.stats_list_mmap import StatsListMemoryMapped
+from mastering_oop.strategies.stats_list_numpy import StatsListNumPy
+
+# these modules print their try-out sections when they are imported
+with contextlib.redirect_stdout(io.StringIO()):
+    from mastering_oop.strategies.table import Table
+    from mastering_oop.strategies.binary_search_tree_from_set import Tree
+    from mastering_oop.strategies.binary_search_tree_node_pool import PooledTree
+    from mastering_oop.strategies.sorted_blocks_tree import SortedBlocksTree
+    from mastering_oop.strategies.concurrent_tree import ConcurrentTree
+    from mastering_oop.strategies.customized_sequence_from_list import (
+        StatsListEager,
+        StatsListLazy,
+        StatsListWithItemGetterSetterDeleter,
+    )
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+Setup = Callable[[], Callable[[], Any]]
+BENCHMARKS: Dict[str, Setup] = {}
+
+
+def benchmark(name: str) -> Callable[[Setup], Setup]:
+    """decorator that registers a setup function under a dotted name"""
+
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def _main_module() -> Any:
+    """FixedPoint and OptimizedPower live in the main.py script, which prints a lot when imported"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import mastering_oop.main as main
+    return main
+
+
+def _numbers(n: int, seed: int = 42) -> List[int]:
+    rng = random.Random(seed)
+    return [rng.randrange(1_000_000) for _ in range(n)]
+
+
+def _hands(n: int, cls: type = Hand, seed: int = 42) -> List[Any]:
+    table = Table(func=make_card, rng=random.Random(seed))  # doesn't reseed the global generator
+    hands = []
+    for _ in range(n):
+        dealt = table.deal()
+        hands.append(cls(dealt.dealer_card, *dealt.cards, table.draw()))
+    return hands
+
+
+# Cards and hands
+# ---------------
+
+@benchmark("deck.construction")
+def deck_construction() -> Callable[[], Any]:
+    return lambda: DeckExtended(func=make_card)
+
+
+@benchmark("deck.deal")
+def deck_deal() -> Callable[[], Any]:
+    table = Table(func=make_card)
+    return table.deal  # reshuffles a new deck every 13 hands
+
+
+@benchmark("hand.total")
+def hand_total() -> Callable[[], Any]:
+    hands = _hands(100)
+    return lambda: [h.total() for h in hands]
+
+
+@benchmark("hand.lazy_property_total")
+def hand_lazy_total() -> Callable[[], Any]:
+    hands = _hands(100, HandLazyProperty)
+    return lambda: [h.total for h in hands]  # recomputed on every access
+
+
+@benchmark("hand.eager_property_total")
+def hand_eager_total() -> Callable[[], Any]:
+    hands = _hands(100, HandEagerProperty)
+    return lambda: [h.total for h in hands]  # plain attribute, computed when cards were added
+
+
+@benchmark("hand.eager_property_add_card")
+def hand_eager_add() -> Callable[[], Any]:
+    hands = _hands(100, HandEagerProperty)
+    card = make_card(5, Suit.Heart)
+
+    def add_and_remove() -> None:
+        for h in hands:
+            h.card = card
+            del h.card
+
+    return add_and_remove
+
+
+# Tree
+# ----
+# The same operations are timed for every backend of the Tree interface:
+# the TreeNode based Tree (plain and balanced), PooledTree, SortedBlocksTree and ConcurrentTree.
+
+TREE_BACKENDS: Dict[str, Callable[..., Any]] = {
+    "": Tree,
+    "balanced_": lambda items=None: Tree(items, balanced=True),
+    "pooled_": PooledTree,
+    "blocks_": SortedBlocksTree,
+    "concurrent_": ConcurrentTree,
+}
+
+
+def _tree_benchmarks(prefix: str, backend: Callable[..., Any]) -> None:
+    """registers build, lookup, iteration and insert/delete benchmarks for one backend"""
+
+    @benchmark(f"tree.{prefix}build_random_1000")
+    def build() -> Callable[[], Any]:
+        items = _numbers(1000)
+        return lambda: backend(items)
+
+    @benchmark(f"tree.{prefix}contains_1000")
+    def contains() -> Callable[[], Any]:
+        items = _numbers(1000)
+        tree = backend(items)
+        return lambda: [x in tree for x in items]
+
+    @benchmark(f"tree.{prefix}iterate_1000")
+    def iterate() -> Callable[[], Any]:
+        tree = backend(_numbers(1000))
+        return lambda: list(tree)
+
+    @benchmark(f"tree.{prefix}add_discard_1000")
+    def add_discard() -> Callable[[], Any]:
+        extra = _numbers(1000, seed=7)
+        tree = backend(_numbers(1000))
+
+        def add_and_discard() -> None:
+            for x in extra:
+                tree.add(x)
+            for x in extra:
+                tree.discard(x)
+
+        return add_and_discard
+
+    @benchmark(f"tree.{prefix}add_sorted_1000")
+    def add_sorted() -> Callable[[], Any]:
+        items = sorted(_numbers(1000))
+
+        def add_all() -> None:
+            tree = backend()
+            for x in items:
+                tree.add(x)
+
+        return add_all
+
+
+for prefix, backend in TREE_BACKENDS.items():
+    _tree_benchmarks(prefix, backend)
+
+
+@benchmark("tree.union_1000_1000")
+def tree_union() -> Callable[[], Any]:
+    a, b = Tree(_numbers(1000)), Tree(_numbers(1000, seed=7))
+    return lambda: a | b
+
+
+# a Hand compares by total(), which it computes again for every comparison;
+# with key=Hand.total, the tree computes it once per hand and compares the cached ints
+@benchmark("tree.hands_add_1000")
+def tree_hands() -> Callable[[], Any]:
+    hands = _hands(1000)
+    return lambda: _add_all(Tree(balanced=True), hands)
+
+
+@benchmark("tree.hands_key_add_1000")
+def tree_hands_key() -> Callable[[], Any]:
+    hands = _hands(1000)
+    return lambda: _add_all(Tree(balanced=True, key=Hand.total), hands)
+
+
+# set mode compares a new hand with == to every hand of the same total (about 50 per total here);
+# a key that tells all the hands apart keeps those runs at one node, so an add is O(log n) again
+@benchmark("tree.hands_unique_key_add_1000")
+def tree_hands_unique_key() -> Callable[[], Any]:
+    hands = _hands(1000)
+    return lambda: _add_all(Tree(balanced=True, key=lambda hand: (hand.total(), repr(hand))), hands)
+
+
+@benchmark("tree.pickle_roundtrip_10000")
+def tree_pickle() -> Callable[[], Any]:
+    tree = Tree(_numbers(10_000), balanced=True)
+    return lambda: pickle.loads(pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+# StatsList
+# ---------
+
+@benchmark("statslist.lazy_append_1000_and_stats")
+def statslist_lazy() -> Callable[[], Any]:
+    values = [float(x) for x in _numbers(1000)]
+
+    def run() -> float:
+        s = StatsListLazy([])
+        for v in values:
+            s.append(v)
+        return s.mean + s.stdev
+
+    return run
+
+
+@benchmark("statslist.eager_append_1000_and_stats")
+def statslist_eager() -> Callable[[], Any]:
+    values = [float(x) for x in _numbers(1000)]
+
+    def run() -> float:
+        s = StatsListEager([])
+        for v in values:
+            s.append(v)
+        return s.mean + s.stdev
+
+    return run
+
+
+@benchmark("statslist.lazy_stats_10000")
+def statslist_lazy_stats() -> Callable[[], Any]:
+    s = StatsListLazy([float(x) for x in _numbers(10_000)])
+    return lambda: (s.mean, s.stdev)
+
+
+@benchmark("statslist.eager_stats_10000")
+def statslist_eager_stats() -> Callable[[], Any]:
+    s = StatsListEager([float(x) for x in _numbers(10_000)])
+    return lambda: (s.mean, s.stdev)
+
+
+@benchmark("statslist.slice_assignment_100")
+def statslist_slices() -> Callable[[], Any]:
+    s = StatsListWithItemGetterSetterDeleter([float(x) for x in _numbers(10_000)])
+    new = [1.0] * 100
+    return lambda: s.__setitem__(slice(1000, 1100), new)
+
+
+@benchmark("statslist.numpy_append_1000_and_stats")
+def statslist_numpy() -> Callable[[], Any]:
+    values = [float(x) for x in _numbers(1000)]
+
+    def run() -> float:
+        s = StatsListNumPy()
+        for v in values:
+            s.append(v)
+        return s.mean + s.stdev
+
+    return run
+
+
+@benchmark("statslist.numpy_extend_and_stats_10000")
+def statslist_numpy_extend() -> Callable[[], Any]:
+    values = [float(x) for x in _numbers(10_000)]
+
+    def run() -> float:
+        s = StatsListNumPy()
+        s.extend(values)
+        return s.mean + s.stdev
+
+    return run
+
+
+@benchmark("statslist.rolling_append_10000_window_100")
+def statslist_rolling() -> Callable[[], Any]:
+    values = [float(x) for x in _numbers(10_000)]
+
+    def run() -> float:
+        window = RollingStatsList(100)
+        for v in values:
+            window.append(v)
+        return window.mean + window.stdev + window.max
+
+    return run
+
+
+@benchmark("statslist.numpy_stats_10000")
+def statslist_numpy_stats() -> Callable[[], Any]:
+    s = StatsListNumPy([float(x) for x in _numbers(10_000)])
+    return lambda: (s.mean, s.stdev)
+
+
+@benchmark("statslist.mmap_append_10000_and_reopen")
+def statslist_mmap() -> Callable[[], Any]:
+    import tempfile
+
+    values = [float(x) for x in _numbers(10_000)]
+    path = Path(tempfile.mkdtemp()) / "series.stats"
+
+    def run() -> float:
+        with StatsListMemoryMapped(path, buffer_size=4096) as s:
+            s.extend(values)
+        with StatsListMemoryMapped(path) as s:
+            result = s.mean + s.stdev
+        path.unlink()
+        return result
+
+    return run
+
+
+@benchmark("statslist.grouped_by_10_keys_10000")
+def statslist_grouped() -> Callable[[], Any]:
+    values = [float(x) for x in _numbers(10_000)]
+    keys = [int(v) % 10 for v in values]
+
+    def run() -> Any:
+        grouped = GroupedStats(keys, values)
+        return [(group.mean, group.stdev) for group in grouped.values()]
+
+    return run
+
+
+@benchmark("statslist.sketches_add_10000_and_p99")
+def statslist_sketches() -> Callable[[], Any]:
+    values = [float(x) for x in _numbers(10_000)]
+
+    def run() -> Any:
+        kll, log = KLLSketch(seed=0), LogBinHistogram()
+        kll.update(values)
+        log.update(values)
+        return kll.quantile(0.99), log.quantile(0.99)
+
+    return run
+
+
+# Numbers
+# -------
+
+@benchmark("fixedpoint.add_mul")
+def fixedpoint_arithmetic() -> Callable[[], Any]:
+    FixedPoint = _main_module().FixedPoint
+    a, b = FixedPoint(1234, 100), FixedPoint(567, 100)
+
+    def run() -> Any:
+        for _ in range(100):
+            (a + b) * 3
+            a - b
+
+    return run
+
+
+@benchmark("power.plain")
+def power_plain() -> Callable[[], Any]:
+    power = _main_module().Power()
+    return lambda: power(3, 1000)
+
+
+@benchmark("power.optimized_cold_cache")
+def power_optimized_cold() -> Callable[[], Any]:
+    OptimizedPower = _main_module().OptimizedPower
+    return lambda: OptimizedPower()(3, 1000)
+
+
+@benchmark("power.optimized_warm_cache")
+def power_optimized_warm() -> Callable[[], Any]:
+    power = _main_module().OptimizedPower()
+    power(3, 1000)
+    return lambda: power(3, 1000)
+
+
+# Serialisation
+# -------------
+
+def _blog(posts: int = 100) -> Blog_x:
+    blog = Blog_x("Benchmark")
+    for i in range(posts):
+        post = travel_x[i % len(travel_x)]
+        blog.append(Post(post.date, f"{post.title} {i}", post.rst_text, list(post.tags)))
+    return blog
+
+
+@benchmark("serialisation.json_roundtrip_100_posts")
+def json_roundtrip() -> Callable[[], Any]:
+    blog = _blog()
+    return lambda: json.loads(json.dumps(blog.as_dict()))
+
+
+@benchmark("serialisation.pickle_roundtrip_100_posts")
+def pickle_roundtrip() -> Callable[[], Any]:
+    blog = _blog()
+    return lambda: pickle.loads(pickle.dumps(blog))
+
+
+@benchmark("serialisation.json_stream_dump_100_posts")
+def json_stream_dump() -> Callable[[], Any]:
+    blog = _blog()
+    return lambda: streaming_json.dump(blog, io.StringIO())
+
+
+@benchmark("serialisation.jsonl_roundtrip_100_posts")
+def jsonl_roundtrip() -> Callable[[], Any]:
+    blog = _blog()
+
+    def run() -> Blog_x:
+        target = io.StringIO()
+        streaming_json.dump_lines(blog, target)
+        return streaming_json.load_lines(io.StringIO(target.getvalue()))
+
+    return run
+
+
+# Memory
+# ------
+# Memory isn't timed, it's measured with tracemalloc as the bytes a container allocates per item;
+# the items themselves are created before the measurement starts, so they don't count.
+
+MEMORY_BENCHMARKS: Dict[str, Callable[[List[int]], Any]] = {
+    "tree.bulk_build": lambda items: Tree(items),
+    "tree.balanced_bulk_build": lambda items: Tree(items, balanced=True),
+    "tree.add_one_by_one": lambda items: _add_all(Tree(), items),
+    "tree.pooled_bulk_build": lambda items: PooledTree(items),
+    "tree.pooled_add_one_by_one": lambda items: _add_all(PooledTree(), items),
+    "tree.blocks_bulk_build": lambda items: SortedBlocksTree(items),
+    "tree.blocks_add_one_by_one": lambda items: _add_all(SortedBlocksTree(), items),
+    "statslist.lazy": lambda items: StatsListLazy([float(x) for x in items]),
+    "statslist.numpy": lambda items: StatsListNumPy(float(x) for x in items),
+}
+
+
+def _add_all(container: Any, items: List[int]) -> Any:
+    for item in items:
+        container.add(item)
+    return container
+
+
+def bytes_per_item(build: Callable[[List[int]], Any], n: int = 100_000) -> float:
+    items = _numbers(n)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        container = build(items)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del container
+    return (after - before) / n
+
+
+def run_memory(selected: Optional[str] = None, n: int = 100_000) -> Dict[str, float]:
+    results = {}
+    for name, build in MEMORY_BENCHMARKS.items():
+        if selected and not name.startswith(selected):
+            continue
+        results[name] = bytes_per_item(build, n)
+        print(f"{name:45s} {results[name]:12.1f} bytes/item")
+    return results
+
+
+# Running and comparing
+# ---------------------
+
+def measure(setup: Setup, repeat: int = 5, min_time: float = 0.2) -> float:
+    """seconds per call, best of `repeat` runs that each take about `min_time` seconds"""
+    timer = timeit.Timer(setup())
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(selected: Optional[str] = None, repeat: int = 5) -> Dict[str, float]:
+    """runs all benchmarks whose name starts with `selected` (all of them by default)"""
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if selected and not name.startswith(selected):
+            continue
+        results[name] = measure(setup, repeat=repeat)
+        print(f"{name:45s} {results[name] * 1e6:12.2f} µs")
+    return results
+
+
+def save(results: Dict[str, float], path: Path) -> None:
+    document = {
+        "python": sys.version,
+        "machine": platform.platform(),
+        "results": results,
+    }
+    path.write_text(json.dumps(document, indent=4))
+
+
+def compare(results: Dict[str, float], path: Path, threshold: float = 0.1) -> List[str]:
+    """names of the benchmarks that are more than `threshold` (relative) slower than the baseline"""
+    baseline = json.loads(path.read_text())["results"]
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{name:45s} {change:+8.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("runs the benchmark suite")
+    parser.add_argument("--only", type=str, default=None, help="only run benchmarks with this name prefix, e.g. `tree`")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per benchmark, the best one counts")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, type=Path, help="save results as baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, type=Path, help="compare with a baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slow down that counts as regression")
+    parser.add_argument("--memory", action="store_true", help="measure bytes per item instead of time")
+    args = parser.parse_args()
+
+    if args.memory:
+        run_memory(args.only)
+        sys.exit(0)
+    results = run(args.only, repeat=args.repeat)
+    if args.compare:
+        print("")
+        if compare(results, args.compare, threshold=args.threshold):
+            sys.exit(1)
+    if args.save:
+        save(results, args.save)
+
+# can be run with `python -m mastering_oop.benchmarks.benchmark_suite --save`
+# and later with `python -m mastering_oop.benchmarks.benchmark_suite --compare --threshold 0.2`
@@ -27,6 +27,11 @@ class CardFactory:
         return self.class_(self.rank_str, suit)
 
 
+def make_card(rank: int, suit: Suit) -> Card:
+    """card factory function, can be passed as `func` to the deck and table classes"""
+    return CardFactory().rank(rank).suit(suit)
+
+
 """print("############### Try Out ###############")
 
 factory = CardFactory()
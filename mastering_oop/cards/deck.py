@@ -28,10 +28,11 @@ class DeckExtended(list):
     """extends to the list class, there is no need to reimplement pop(), since list
     class is already providing this method"""
 
-    def __init__(self, func) -> None:
-        """makes a deck of cards and shuffles it"""
+    def __init__(self, func, rng: Optional[random.Random] = None) -> None:
+        """makes a deck of cards and shuffles it, with the random number generator `rng`
+        (a random.Random instance) or, by default, with the global one of the random module"""
         super().__init__(func(r + 1, s) for r in range(13) for s in Suit)
-        random.shuffle(self)
+        (random if rng is None else rng).shuffle(self)
 
 
 class DeckDesigned(list):
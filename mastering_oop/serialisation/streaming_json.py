@@ -0,0 +1,152 @@
+import datetime
+import json
+from typing import Any, Dict, Iterable, Iterator, TextIO
+
+from mastering_oop.serialisation.persistent_classes import Blog_x, Post
+
+# into_json.py builds the whole document as one string with json.dumps() before it's written, so a blog
+# needs memory for its objects and for its complete JSON text at the same time.
+# Here, the document is written while it's encoded, one post at a time, and the pieces are collected
+# into chunks of about `chunk_size` characters, each written with one write() call (instead of one
+# call per piece, or one huge string).
+# The memory needed doesn't depend on the size of the blog: the posts can even come from a generator,
+# so a blog that doesn't fit into memory can be exported as well.
+# Every post is encoded with JSONEncoder.encode() instead of iterencode(): iterencode() yields even
+# smaller pieces, but only encode() uses the C implementation of the encoder, and a single post is
+# small anyway. iterencode() is what bounds the memory for one huge object, the posts do that here.
+#
+# Two formats:
+# - a JSON document, {"__class__": "Blog_x", ..., "__kw__": {"title": ..., "posts": [...]}}, the format of
+#   blogx_encode() in into_json.py (which json.dumps() ignores for Blog_x, because it's a list), with the
+#   keyword `posts` that Blog_x.__init__() takes;
+# - JSON Lines: a first line with the Blog_x and an empty list of posts, then one Post per line. Adding
+#   posts to an exported blog only means appending lines to the file, and reading it back needs only
+#   one line in memory at a time.
+# The encoding is the one of blogx_encode(), ported here, so that into_json.py (which runs its examples
+# when it's imported) isn't needed.
+
+
+class BlogxEncoder(json.JSONEncoder):
+    """encodes datetime and Post objects as dicts with __class__, __args__ and __kw__, like blogx_encode()"""
+
+    def default(self, object: Any) -> Any:
+        if isinstance(object, datetime.datetime):
+            return dict(
+                __class__="datetime.datetime",
+                __args__=[],
+                __kw__=dict(
+                    year=object.year,
+                    month=object.month,
+                    day=object.day,
+                    hour=object.hour,
+                    minute=object.minute,
+                    second=object.second,
+                ),
+            )
+        if isinstance(object, Post):
+            return dict(
+                __class__="Post",
+                __args__=[],
+                __kw__=dict(date=object.date, title=object.title, rst_text=object.rst_text, tags=object.tags),
+            )
+        return super().default(object)
+
+
+# the classes that may be created while decoding, instead of the eval() of blogx_decode()
+CLASSES = {"datetime.datetime": datetime.datetime, "Post": Post, "Blog_x": Blog_x}
+
+
+def blogx_decode(some_dict: Dict[str, Any]) -> Any:
+    if set(some_dict.keys()) == {"__class__", "__args__", "__kw__"}:
+        class_ = CLASSES[some_dict["__class__"]]
+        return class_(*some_dict["__args__"], **some_dict["__kw__"])
+    return some_dict
+
+
+def _header(blog: Blog_x) -> str:
+    """the start of the encoded Blog_x, up to its list of posts"""
+    return f'{{"__class__": "Blog_x", "__args__": [], "__kw__": {{"title": {json.dumps(blog.title)}, "posts": ['
+
+
+def write_chunked(target: TextIO, pieces: Iterable[str], chunk_size: int = 65536) -> None:
+    """writes the pieces, joined into chunks of at least `chunk_size` characters"""
+    chunk, size = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            target.write("".join(chunk))
+            chunk, size = [], 0
+    if chunk:
+        target.write("".join(chunk))
+
+
+def dump(blog: Blog_x, target: TextIO, chunk_size: int = 65536) -> None:
+    """writes the blog as one JSON document; `blog` can be any iterable of posts with a title"""
+    encoder = BlogxEncoder()
+
+    def pieces() -> Iterator[str]:
+        yield _header(blog)
+        for i, post in enumerate(blog):
+            if i:
+                yield ", "
+            yield encoder.encode(post)
+        yield "]}}"
+
+    write_chunked(target, pieces(), chunk_size)
+
+
+def load(source: TextIO) -> Blog_x:
+    """reads a blog written by dump(); that needs the whole document in memory, JSON Lines don't"""
+    return json.load(source, object_hook=blogx_decode)
+
+
+def dump_lines(blog: Blog_x, target: TextIO, chunk_size: int = 65536) -> None:
+    """writes the blog as JSON Lines: the blog without its posts, then one post per line"""
+    target.write(_header(blog) + "]}}\n")
+    append_lines(blog, target, chunk_size)
+
+
+def append_lines(posts: Iterable[Post], target: TextIO, chunk_size: int = 65536) -> None:
+    """appends posts to a blog written by dump_lines(), e.g. to a file opened with mode "a" """
+    encoder = BlogxEncoder()
+
+    def pieces() -> Iterator[str]:
+        for post in posts:
+            yield encoder.encode(post)
+            yield "\n"
+
+    write_chunked(target, pieces(), chunk_size)
+
+
+def iter_lines(source: TextIO) -> Iterator[Any]:
+    """the Blog_x (without posts) from the first line, then the posts, one line at a time"""
+    for line in source:
+        if line.strip():
+            yield json.loads(line, object_hook=blogx_decode)
+
+
+def load_lines(source: TextIO) -> Blog_x:
+    objects = iter_lines(source)
+    blog = next(objects)
+    blog.extend(objects)
+    return blog
+
+
+'''print("############### Try Out ###############")
+import io
+
+from mastering_oop.serialisation.persistent_classes import travel_x
+
+document = io.StringIO()
+dump(travel_x, document)
+print(document.getvalue())
+copy = load(io.StringIO(document.getvalue()))
+print(copy.title, copy == travel_x)
+
+lines = io.StringIO()
+dump_lines(travel_x, lines)
+append_lines([Post(datetime.datetime(2013, 11, 20, 9, 0), "Afloat", "Some relief.", ["#RedRanger"])], lines)
+print(lines.getvalue())
+copy = load_lines(io.StringIO(lines.getvalue()))
+print(copy.title, len(copy), copy[-1])'''
@@ -0,0 +1,33 @@
+import datetime
+import io
+
+from mastering_oop.serialisation import streaming_json
+from mastering_oop.serialisation.persistent_classes import Blog_x, Post, travel_x
+
+
+def test_dump_and_load_round_trip_in_small_chunks():
+    target = io.StringIO()
+    writes = []
+    target.write = lambda text: writes.append(text) or len(text)  # records the chunks
+    streaming_json.dump(travel_x, target, chunk_size=100)
+    text = "".join(writes)
+    assert len(writes) == 3  # a chunk as soon as 100 characters are collected: after every post, and the end
+
+    copy = streaming_json.load(io.StringIO(text))
+    assert isinstance(copy, Blog_x) and copy.title == travel_x.title and copy == travel_x
+
+
+def test_json_lines_stream_posts_and_can_be_appended(tmp_path):
+    path = tmp_path / "blog.jsonl"
+    with path.open("w", encoding="UTF-8") as target:
+        streaming_json.dump_lines(Blog_x("Travel"), target)  # no posts yet
+    with path.open("a", encoding="UTF-8") as target:
+        streaming_json.append_lines(iter(travel_x), target)
+        streaming_json.append_lines(
+            (Post(datetime.datetime(2014, 1, i), f"Day {i}", "Calm.", ["#Log"]) for i in range(1, 4)), target
+        )
+    assert len(path.read_text(encoding="UTF-8").splitlines()) == 1 + len(travel_x) + 3
+
+    with path.open(encoding="UTF-8") as source:
+        blog = streaming_json.load_lines(source)
+    assert blog.title == "Travel" and blog[: len(travel_x)] == travel_x and blog[-1].title == "Day 3"
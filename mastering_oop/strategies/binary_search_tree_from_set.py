@@ -1,6 +1,10 @@
 from abc import ABCMeta, abstractmethod
+from bisect import bisect_left
 from collections.abc import MutableSet
-from typing import Iterable, Any, Iterator, Optional, cast
+from itertools import accumulate, chain, repeat
+from operator import attrgetter, itemgetter
+from typing import BinaryIO, Callable, Dict, Iterable, Any, Iterator, List, Optional, Tuple, cast
+import pickle
 import weakref
 
 # Here, we create a binary search tree that uses the MutableSet class from collections.abc as a base class.
@@ -24,19 +28,130 @@ class Tree(MutableSet):
     """Facade class that will contain TreeNode() objects;
     abstract superclass provides a default implementation of remove() and many other features"""
 
-    def __init__(self, source: Iterable[Comparable] = None) -> None:
-        self.root = TreeNode(None)
+    def __init__(
+        self,
+        source: Iterable[Comparable] = None,
+        balanced: bool = False,
+        key: Optional[Callable[[Any], Comparable]] = None,
+        multiset: bool = False,
+    ) -> None:
+        """with `balanced=True` the tree is built from AVLTreeNode objects, that keep it height-balanced,
+        so that sorted input doesn't degrade it to a linked list;
+        with a `key` function, the items are ordered by their keys, like in sorted(items, key=key);
+        with `multiset=True` the tree counts the copies of equal items instead of ignoring them"""
+        self.root = AVLTreeNode(None) if balanced else TreeNode(None)
+        self.key = key
+        self.multiset = multiset
         self.size = 0
-        if source:
-            for item in source: #source is iterable
-                self.root.add(item)
-                self.size += 1
+        if source is not None:
+            self._build_from(source)
+
+    def _build_from(self, source: Iterable[Comparable]) -> None:
+        """fills the empty tree with the items of `source`: instead of adding the items one by one
+        (O(n log n) at best, O(n²) for sorted input into a plain tree), we sort them once and build
+        a balanced tree in O(n); sorted() uses timsort, which recognizes already sorted input in a
+        single linear pass"""
+        if self.key is None:
+            items = sorted(source)
+            keys = items
+        else:
+            # the keys are computed once per item and sorted as (key, item) pairs;
+            # sorting by the key alone keeps items with equal keys from being compared
+            pairs = sorted(((self.key(item), item) for item in source), key=itemgetter(0))
+            items, keys = [item for _, item in pairs], [k for k, _ in pairs]
+        self._build(*self._distinct(self._runs(zip(keys, items, repeat(1)))))
+
+    # Set and multiset mode: every node holds a different item, so equal items never cost extra nodes.
+    # In set mode (the default), adding an item that is already there changes nothing, like for a set.
+    # In multiset mode, every node counts the copies of its item: adding one more copy just increments
+    # the count, removing a copy decrements it and the node is only unlinked when the last copy goes.
+    # len() and the subtree sizes count all the copies, and iterating yields every item count times.
+    # The price of both modes: items with equal keys have no order among themselves (a Hand compares by
+    # its total, like its key, so Hands of the same total are neither less nor more than each other, but
+    # not ==), so to find out whether an item is there already, add(), find() and remove() compare it
+    # with == to the items of the run of keys that are equal in order, O(log n + r) for a run of r items,
+    # instead of the O(log n) of just linking in another node. With few different keys that's most of the
+    # time: 1000 hands have only about 20 totals, and tree.hands_key_add_1000 takes about twice as long as
+    # it did before set mode. Without a key, every step of that scan computes total() again, so
+    # tree.hands_add_1000 takes about 10 times as long as with key=Hand.total. A key that tells the items
+    # apart, like (total, repr) in tree.hands_unique_key_add_1000, keeps every run at one node, and an add
+    # that finds its item is an O(log n) no-op again; what remains is the cost of computing that finer key
+    # once per item.
+
+    # Key caching: comparing items like CardWithComparisons or Hand calls a Python method for every
+    # comparison, which may compute things like total() again and again, at every level of every
+    # search. With a `key` function, the key of an item is computed once when it's inserted and kept
+    # in its node; the searches compute the key of the item they look for once, and from then on
+    # only the cached keys are compared. Without a key function, the key of an item is the item itself.
+
+    def _key(self, item: Any) -> Any:
+        return item if self.key is None else self.key(item)
+
+    def _distinct(self, runs: Iterable[Tuple[Any, List[List[Any]]]]) -> Tuple[List[Any], List[Any], List[int]]:
+        """the different items of the runs, their keys and counts, which are 1 in set mode;
+        without a key function, every item is its own key, not the first one of its run"""
+        items: List[Any] = []
+        keys: List[Any] = []
+        counts: List[int] = []
+        for key, run in runs:
+            for item, n in run:
+                if n > 0:
+                    items.append(item)
+                    keys.append(key if self.key is not None else item)
+                    counts.append(n if self.multiset else 1)
+        return items, keys, counts
+
+    def _build(
+        self,
+        items: List[Comparable],
+        keys: Optional[List[Any]] = None,
+        counts: Optional[List[int]] = None,
+        shape: Optional[List[int]] = None,
+    ) -> None:
+        """links a perfectly balanced tree of the sorted, different `items` below the (empty) root sentinel
+        in O(n): the middle item becomes the root, the two halves left and right of it become its subtrees;
+        `keys` are the keys of the items, if they are not the items themselves, `counts` their number of copies.
+        A `shape` from _shape() rebuilds exactly the tree it was taken from, instead of a balanced one"""
+        node_class = self.root.__class__
+        if keys is None:
+            keys = items
+        if counts is not None:
+            sizes = [0, *accumulate(counts)]  # sizes[hi] - sizes[lo] is the size of items[lo:hi]
+        less_sizes = iter(shape) if shape is not None else None
+        built: List[TreeNode] = []
+        stack = [(0, len(items), self.root, "more")]  # slices items[lo:hi] that still need to be linked in
+        while stack:
+            lo, hi, parent, side = stack.pop()
+            if lo >= hi:
+                continue
+            if less_sizes is None:
+                mid = (lo + hi) // 2
+            elif counts is None:
+                mid = lo + next(less_sizes)
+            else:  # the size of the less side counts the copies: find the item it ends at
+                mid = bisect_left(sizes, sizes[lo] + next(less_sizes), lo, hi)
+            node = node_class(items[mid], parent=parent, key=keys[mid], keyed=True)
+            setattr(parent, side, node)
+            if counts is not None:
+                node.count = counts[mid]
+            if less_sizes is None:
+                node._built(hi - lo)
+                if counts is not None:
+                    node.subtree_size = sizes[hi] - sizes[lo]
+            else:
+                built.append(node)
+            # the less side is popped first, so that the nodes are built in pre-order, like the shape
+            stack.append((mid + 1, hi, node, "more"))
+            stack.append((lo, mid, node, "less"))
+        for node in reversed(built):  # the children before their parents
+            node._update()
+        self.size = len(items) if counts is None else sizes[-1]
 
     def add(self, item: Comparable) -> None:
         """delegates adding to the TreeNode object at the root of their tree,
         and keeps track of the Tree's size"""
-        self.root.add(item)
-        self.size += 1
+        if self.root.add(item, self._key(item), self.multiset, self.key is not None):
+            self.size += 1
 
     def discard(self, item: Comparable) -> None:
         """delegates deleting to the TreeNode object at the root of their tree,
@@ -44,7 +159,7 @@ class Tree(MutableSet):
         see: https://docs.python.org/3.12/library/collections.abc.html#collections-abstract-base-classes"""
         if self.root.more:
             try:
-                self.root.more.remove(item)
+                self.root.more.remove(item, self._key(item), self.key is not None)
                 self.size -= 1
             except KeyError:
                 pass
@@ -53,21 +168,349 @@ class Tree(MutableSet):
 
     def __contains__(self, item: Any) -> bool:
         if self.root.more:
-            self.root.more.find(cast(Comparable, item))
-            return True
+            try:
+                self.root.more.find(cast(Comparable, item), self._key(item), self.key is not None)
+                return True
+            except KeyError:
+                return False
         else:
             return False
 
     def __iter__(self) -> Iterator[Comparable]:
-        """generator function that delegates the real work into the recursive iterator in the TreeNode class"""
+        """generator function that delegates the real work to the iterator in the TreeNode class"""
         if self.root.more:
-            for item in iter(self.root.more):
-                yield item
+            # in set mode, every node holds one item, so the counts can be skipped
+            yield from self.root.more if self.multiset else map(attrgetter("item"), self._nodes())
         # Otherwise, the tree is empty.
 
+    def count(self, item: Any) -> int:
+        """the number of copies of `item`, which is 0 or 1 in set mode"""
+        try:
+            return self.root.find(item, self._key(item), self.key is not None).count
+        except KeyError:
+            return 0
+
+    def _nodes(self) -> Iterator["TreeNode"]:
+        return self.root.more._nodes() if self.root.more else iter(())
+
     def __len__(self) -> int:
         return self.size
 
+    def clear(self) -> None:
+        """the mixin would pop the items one by one, but we can simply drop all nodes at once"""
+        self.root = self.root.__class__(None)
+        self.size = 0
+
+    # Order statistics: every node knows the size of its subtree, so we can count the items
+    # left of a node without visiting them. These work in O(depth), which is O(log n) if balanced.
+
+    def select(self, k: int) -> Comparable:
+        """the k-th smallest item, counting from 0"""
+        if not 0 <= k < self.size:
+            raise IndexError(f"tree index {k} out of range")
+        node = self.root.more
+        while True:
+            left = TreeNode._size(node.less)
+            if k < left:
+                node = node.less
+            elif k < left + node.count:
+                return node.item
+            else:
+                k -= left + node.count
+                node = node.more
+
+    def rank(self, item: Comparable) -> int:
+        """the number of items less than `item`, which is the index `item` has or would have"""
+        key = self._key(item)
+        rank, node = 0, self.root.more
+        while node is not None:
+            if node.key < key:
+                rank += TreeNode._size(node.less) + node.count  # node and everything on its less side
+                node = node.more
+            else:
+                node = node.less
+        return rank
+
+    def __getitem__(self, index: int) -> Comparable:
+        """tree[k] like a sorted list, negative indices count from the end"""
+        if not isinstance(index, int):
+            raise TypeError(f"tree indices must be integers, not {type(index).__name__}")
+        return self.select(index + self.size if index < 0 else index)
+
+    # Range queries: instead of walking the whole tree, they descend straight to the first item in
+    # range and stream the items from there, which costs O(depth + k) for k items.
+
+    def irange(
+        self,
+        lo: Optional[Comparable] = None,
+        hi: Optional[Comparable] = None,
+        inclusive: Tuple[bool, bool] = (True, True),
+        reverse: bool = False,
+    ) -> Iterator[Comparable]:
+        """lazily yields the items between `lo` and `hi` in order (or in reverse order);
+        a bound of None means no bound, `inclusive` tells if the bounds themselves are included"""
+
+        lo_key = None if lo is None else self._key(lo)
+        hi_key = None if hi is None else self._key(hi)
+
+        def below(key: Any) -> bool:
+            return lo is not None and (key < lo_key if inclusive[0] else key <= lo_key)
+
+        def above(key: Any) -> bool:
+            return hi is not None and (hi_key < key if inclusive[1] else hi_key <= key)
+
+        # walking in reverse is the mirror image: swap the sides and the bounds
+        near, far = ("more", "less") if reverse else ("less", "more")
+        before, after = (above, below) if reverse else (below, above)
+
+        # the stack holds the nodes whose items are still to come, the next one on top
+        stack: List[TreeNode] = []
+        node = self.root.more
+        while node is not None:  # descend to the first item in range
+            if before(node.key):
+                node = getattr(node, far)
+            else:
+                stack.append(node)
+                node = getattr(node, near)
+        while stack:
+            node = stack.pop()
+            if after(node.key):
+                return
+            yield from repeat(node.item, node.count)
+            node = getattr(node, far)
+            while node is not None:
+                stack.append(node)
+                node = getattr(node, near)
+
+    def __reversed__(self) -> Iterator[Comparable]:
+        return self.irange(reverse=True)
+
+    def floor(self, item: Comparable) -> Optional[Comparable]:
+        """the largest item less than or equal to `item`, None if there is none"""
+        key = self._key(item)
+        result, node = None, self.root.more
+        while node is not None:
+            if key < node.key:
+                node = node.less
+            else:
+                result, node = node.item, node.more
+        return result
+
+    def ceiling(self, item: Comparable) -> Optional[Comparable]:
+        """the smallest item greater than or equal to `item`, None if there is none"""
+        key = self._key(item)
+        result, node = None, self.root.more
+        while node is not None:
+            if node.key < key:
+                node = node.more
+            else:
+                result, node = node.item, node.less
+        return result
+
+    # Serialization: the nodes can't be pickled as they are, because of the weakrefs to their parents,
+    # and walking the nested nodes recursively would hit the recursion limit for deep trees anyway.
+    # Instead, a tree is saved flat: its items in sorted order (with their keys and counts, if needed),
+    # from which _build() makes a new balanced tree in O(n). Optionally, the shape of the tree is saved
+    # as well, as the size of the less side of every node in pre-order, to rebuild exactly the same tree.
+    # The key function is pickled by reference, so it must be a module level function (no lambda).
+
+    def _shape(self) -> List[int]:
+        """the size of the less side of every node, in pre-order"""
+        shape: List[int] = []
+        stack = [self.root.more] if self.root.more else []
+        while stack:
+            node = stack.pop()
+            shape.append(TreeNode._size(node.less))
+            if node.more is not None:
+                stack.append(node.more)
+            if node.less is not None:
+                stack.append(node.less)
+        return shape
+
+    def _flat(self, shape: bool = False) -> Dict[str, Any]:
+        nodes = list(self._nodes())
+        return dict(
+            balanced=isinstance(self.root, AVLTreeNode),
+            key=self.key,
+            multiset=self.multiset,
+            items=[node.item for node in nodes],
+            keys=None if self.key is None else [node.key for node in nodes],
+            counts=[node.count for node in nodes] if self.multiset else None,
+            shape=self._shape() if shape else None,
+        )
+
+    @classmethod
+    def _from_flat(cls, state: Dict[str, Any]) -> "Tree":
+        tree = cls(balanced=state["balanced"], key=state["key"], multiset=state["multiset"])
+        tree._build(state["items"], state["keys"], state["counts"], state["shape"])
+        return tree
+
+    def __reduce__(self) -> Tuple[Callable[[Dict[str, Any]], "Tree"], Tuple[Dict[str, Any]]]:
+        """pickle.dumps(tree) saves the flat state, pickle.loads() rebuilds the tree with _from_flat()"""
+        return self.__class__._from_flat, (self._flat(),)
+
+    def dump(self, file: BinaryIO, shape: bool = False) -> None:
+        """writes the tree flat into a binary file; with `shape=True`, load() rebuilds exactly this tree"""
+        pickle.dump(self._flat(shape), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file: BinaryIO) -> "Tree":
+        """reads a tree written by dump()"""
+        return cls._from_flat(pickle.load(file))
+
+    # Set algebra between two Trees: the mixins of MutableSet iterate over one operand and add or
+    # look up the items one by one, which is O(n log n) at best. Two Trees can do better: both
+    # iterate in sorted order, so the result is one merge of the two sorted streams, O(n + m),
+    # and it's already sorted for the linear bulk build.
+    # Equal items are merged as multisets, by their number of copies (like Counter): the union
+    # keeps the larger count, the intersection the smaller one, the difference subtracts the counts
+    # and the symmetric difference keeps their difference. For trees without duplicates that's just
+    # the usual set algebra. The merge walks the nodes and compares their cached keys, so both trees
+    # need the same key function; otherwise, or if the other operand isn't a Tree, the MutableSet mixins
+    # are used. Those build their results with _from_iterable(), which is overridden to keep the mode,
+    # key and balancing of this tree and to use the bulk build.
+
+    @staticmethod
+    def _runs(entries: Iterable[Tuple[Any, Any, int]]) -> Iterator[Tuple[Any, List[List[Any]]]]:
+        """(key, [[item, count], ...]) for every run of keys equal in order in a sorted stream of (key, item, count);
+        different items can have equal keys, those are told apart with == (so they don't need to be hashable)"""
+        run_key: Any = None
+        counted: Optional[List[List[Any]]] = None
+        for key, item, n in entries:
+            if counted is None or run_key < key:  # sorted: a key that isn't more is equal in order
+                if counted is not None:
+                    yield run_key, counted
+                run_key, counted = key, []
+            for entry in counted:
+                if entry[0] == item:
+                    entry[1] += n
+                    break
+            else:
+                counted.append([item, n])
+        if counted is not None:
+            yield run_key, counted
+
+    def _counted_nodes(self) -> Iterator[Tuple[Any, Any, int]]:
+        return ((node.key, node.item, node.count) for node in self._nodes())
+
+    @staticmethod
+    def _match(
+        left: List[List[Any]], right: List[List[Any]], counts: Callable[[int, int], int]
+    ) -> List[Tuple[Any, int]]:
+        """pairs up the equal items of two runs with the same key"""
+        run, rest = [], list(right)
+        for item, n in left:
+            for i, (other, m) in enumerate(rest):
+                if other == item:
+                    run.append((item, counts(n, m)))
+                    del rest[i]
+                    break
+            else:
+                run.append((item, counts(n, 0)))
+        run.extend((item, counts(0, m)) for item, m in rest)
+        return run
+
+    @classmethod
+    def _merge(
+        cls, left: "Tree", right: "Tree", counts: Callable[[int, int], int]
+    ) -> Iterator[Tuple[Any, List[Tuple[Any, int]]]]:
+        """merges the sorted nodes of two trees into runs like _runs(); `counts` tells how many copies
+        of an item to keep, given how often it's in the left and in the right tree"""
+        lefts, rights = cls._runs(left._counted_nodes()), cls._runs(right._counted_nodes())
+        a, b = next(lefts, None), next(rights, None)
+        while a is not None or b is not None:
+            if b is None or (a is not None and a[0] < b[0]):
+                key, run = a[0], [(item, counts(n, 0)) for item, n in a[1]]
+                a = next(lefts, None)
+            elif a is None or b[0] < a[0]:
+                key, run = b[0], [(item, counts(0, n)) for item, n in b[1]]
+                b = next(rights, None)
+            else:
+                key, run = a[0], cls._match(a[1], b[1], counts)
+                a, b = next(lefts, None), next(rights, None)
+            yield key, run
+
+    def _empty_like(self) -> "Tree":
+        """a new, empty tree in the same mode and with the same key as this one"""
+        return self.__class__(balanced=isinstance(self.root, AVLTreeNode), key=self.key, multiset=self.multiset)
+
+    def _from_iterable(self, items: Iterable[Comparable]) -> "Tree":
+        """used by the MutableSet mixins for their results; Set's version would call Tree(items),
+        which is unbalanced, unkeyed and in set mode"""
+        result = self._empty_like()
+        result._build_from(items)
+        return result
+
+    def _mergeable(self, other: Any) -> bool:
+        """the merge needs both trees to be ordered the same way"""
+        return isinstance(other, Tree) and other.key is self.key and other.multiset == self.multiset
+
+    def _combined(self, other: "Tree", counts: Callable[[int, int], int]) -> "Tree":
+        result = self._empty_like()
+        result._build(*result._distinct(self._merge(self, other, counts)))
+        return result
+
+    def _combine_in_place(self, other: "Tree", counts: Callable[[int, int], int]) -> "Tree":
+        merged = self._distinct(self._merge(self, other, counts))
+        self.clear()
+        self._build(*merged)
+        return self
+
+    def __or__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combined(other, max)
+        return super().__or__(other)
+
+    def __and__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combined(other, min)
+        return super().__and__(other)
+
+    def __sub__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combined(other, lambda a, b: max(a - b, 0))
+        return super().__sub__(other)
+
+    def __xor__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combined(other, lambda a, b: abs(a - b))
+        return super().__xor__(other)
+
+    def __ior__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combine_in_place(other, max)
+        return super().__ior__(other)
+
+    def __iand__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combine_in_place(other, min)
+        return super().__iand__(other)
+
+    def __isub__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combine_in_place(other, lambda a, b: max(a - b, 0))
+        return super().__isub__(other)
+
+    def __ixor__(self, other: Any) -> Any:
+        if self._mergeable(other):
+            return self._combine_in_place(other, lambda a, b: abs(a - b))
+        return super().__ixor__(other)
+
+
+def distinct_sorted(items: List[Comparable]) -> List[Comparable]:
+    """the sorted `items` without copies of equal items, for the set mode of the other Tree backends;
+    like in Tree, items that are equal in order are only copies if they are == as well"""
+    distinct: List[Comparable] = []
+    run = 0  # where the run of items equal in order to the last one starts in `distinct`
+    for item in items:
+        if distinct and not distinct[-1] < item:  # sorted: not less means equal in order
+            if item in distinct[run:]:  # compares with ==
+                continue
+        else:
+            run = len(distinct)
+        distinct.append(item)
+    return distinct
+
 
 class TreeNode:
     """bla
@@ -79,10 +522,16 @@ class TreeNode:
         less: Optional["TreeNode"] = None,
         more: Optional["TreeNode"] = None,
         parent: Optional["TreeNode"] = None,
+        key: Any = None,
+        keyed: bool = False,
     ) -> None:
         self.item = item
+        # the cached key the node is ordered by; `keyed` tells that `key` is given, because None can be a key
+        self.key = key if keyed else item
+        self.count = 1  # the number of copies of the item, only ever more than 1 in multiset mode
         self.less = less
         self.more = more
+        self._update()  # sets subtree_size, the number of items in the subtree starting at this node
         if parent:
             # Can't create a weakref to a None value. Only set if there's a value
             self.parent = parent
@@ -102,84 +551,237 @@ class TreeNode:
         self.parent_ref = weakref.ref(value)
 
     def __repr__(self) -> str:
-        return f"TreeNode({self.item!r}, {self.less!r}, {self.more!r})"
-
-    def find(self, item: Comparable) -> "TreeNode":
-        if self.item is None:  # Root
-            if self.more:
-                return self.more.find(item) # recursion
-        elif self.item == item:
-            return self
-        elif self.item > item and self.less:
-            return self.less.find(item) # recursion
-        elif self.item < item and self.more:
-            return self.more.find(item) # recursion
-        raise KeyError
-
-    def __iter__(self) -> Iterator[Comparable]:
-        """using a generator function that yields recursively"""
-        if self.less:
-            yield from self.less
-        if self.item:
-            yield self.item
-        if self.more:
-            yield from self.more
-
-    def add(self, item: Comparable) -> None:
-        if self.item is None:  # Root Special Case
-            if self.more:
-                self.more.add(item)
-            else:
-                self.more = TreeNode(item, parent=self)
-        elif self.item >= item:
-            if self.less:
-                self.less.add(item)
+        """TreeNode(item, less, more) with the children nested in it, written out with an explicit
+        stack of the parts still to come, so that deep trees don't hit the recursion limit"""
+        parts: List[str] = []
+        stack: List[Any] = [self]
+        while stack:
+            part = stack.pop()
+            if isinstance(part, TreeNode):
+                stack.extend((")", part.more, ", ", part.less, f"TreeNode({part.item!r}, "))
             else:
-                self.less = TreeNode(item, parent=self)
-        elif self.item < item:
-            if self.more:
-                self.more.add(item)
+                parts.append("None" if part is None else part)
+        return "".join(parts)
+
+    # All the operations below walk the tree in loops instead of recursing into the children:
+    # that saves a function call per level and trees of any depth work, while recursion would
+    # hit the recursion limit for an unbalanced tree built from sorted input.
+
+    def find(self, item: Comparable, key: Any = None, keyed: bool = False) -> "TreeNode":
+        """the node of `item`, found by comparing the cached keys with `key`, the key of `item`
+        computed by a key function (`keyed`), otherwise the item itself"""
+        if not keyed:
+            key = item
+        node = self.more if self.item is None else self  # the root sentinel holds the tree on its more side
+        while node is not None:
+            if key < node.key:
+                node = node.less
+            elif node.key < key:
+                node = node.more
             else:
-                self.more = TreeNode(item, parent=self)
+                # equal in order, which doesn't make the items equal: without a key function, Hands of the
+                # same total are neither less nor more than each other; with one, different items can
+                # have the same key (and it may well be the item itself, like x // 5 for small ints)
+                if node.item == item:
+                    return node
+                for other in node._equal_keys(key):  # another item with the same key
+                    if other.item == item:
+                        return other
+                break
+        raise KeyError(item)
+
+    def _equal_keys(self, key: Any) -> Iterator["TreeNode"]:
+        """the nodes with keys equal in order to `key` (neither less nor more) in this subtree; they are
+        next to each other in order, but after rotations and removals they can be on both sides of a node"""
+        stack: List[Optional[TreeNode]] = [self]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            less, more = node.key < key, key < node.key  # each compared once, it can be expensive
+            if not less and not more:
+                yield node
+            if not less:
+                stack.append(node.less)
+            if not more:
+                stack.append(node.more)
 
-    def remove(self, item: Comparable) -> None:
-        # Recursive search for node; since the nodes link weakly to each other, memory space can be recovered by garbage collector
-        if self.item is None or item > self.item:
-            if self.more:
-                self.more.remove(item)
-            else:
-                raise KeyError
-        elif item < self.item:
-            if self.less:
-                self.less.remove(item)
+    def __iter__(self) -> Iterator[Comparable]:
+        """every item as often as it's counted"""
+        return chain.from_iterable(repeat(node.item, node.count) for node in self._nodes())
+
+    def _nodes(self) -> Iterator["TreeNode"]:
+        """in-order traversal with an explicit stack, so that every node is yielded by this single
+        generator instead of passing through one nested generator per level"""
+        stack: List[TreeNode] = []
+        node: Optional[TreeNode] = self
+        while stack or node is not None:
+            while node is not None:  # go down the less side as far as possible
+                stack.append(node)
+                node = node.less
+            node = stack.pop()
+            if node.item is not None:  # skip the root sentinel
+                yield node
+            node = node.more
+
+    def add(self, item: Comparable, key: Any = None, multiset: bool = False, keyed: bool = False) -> bool:
+        """links a new node in as a leaf, or, if the item is already there, counts one more copy of it
+        in multiset mode and changes nothing otherwise; returns True if the tree got an item bigger.
+        New nodes are of the same class as self, so that an AVLTreeNode tree stays an AVLTreeNode tree"""
+        if not keyed:
+            key = item
+        node = self
+        checked = False  # an equal key was found and its run searched for the item
+        while True:
+            if node.item is None or not node.key >= key:  # Root Special Case: everything goes to more
+                if node.more is None:
+                    node.more = node.__class__(item, parent=node, key=key, keyed=True)
+                    break
+                node = node.more
             else:
-                raise KeyError
-        else:  # self.item == item
-            if self.less and self.more:  # Two children are present
-                successor = self.more._least()
-                self.item = successor.item
-                if successor.item:
-                    successor.remove(successor.item)
-            elif self.less:  # One child on less
-                self._replace(self.less)
-            elif self.more:  # One child on more
-                self._replace(self.more)
-            else:  # Zero children
-                self._replace(None)
+                if not checked and not key < node.key:  # and not node.key < key: equal in order
+                    checked = True
+                    if node.item == item:
+                        existing: Optional[TreeNode] = node
+                    else:
+                        existing = next((other for other in node._equal_keys(key) if other.item == item), None)
+                    if existing is not None:
+                        if not multiset:
+                            return False
+                        existing.count += 1
+                        existing._retrace()
+                        return True
+                if node.less is None:
+                    node.less = node.__class__(item, parent=node, key=key, keyed=True)
+                    break
+                node = node.less
+        node._retrace()
+        return True
+
+    def remove(self, item: Comparable, key: Any = None, keyed: bool = False) -> None:
+        """since the nodes link weakly to their parents, the memory of an unlinked node can be recovered by the garbage collector"""
+        node = self.find(item, key, keyed)
+        if node.count > 1:  # multiset mode: one copy less, the node stays
+            node.count -= 1
+            node._retrace()
+            return
+        if node.less and node.more:  # Two children are present
+            # the successor takes over the item, its key and count; it has no less child, so it's easy to unlink
+            successor = node.more._least()
+            node.item, node.key, node.count = successor.item, successor.key, successor.count
+            node = successor
+        node._replace(node.less if node.less is not None else node.more)  # one or zero children
 
     def _least(self) -> "TreeNode":
-        if self.less is None:
-            return self
-        return self.less._least()
+        node = self
+        while node.less is not None:
+            node = node.less
+        return node
 
     def _replace(self, new: Optional["TreeNode"] = None) -> None:
-        if self.parent:
-            if self == self.parent.less:
-                self.parent.less = new
+        parent = self.parent
+        if parent:
+            if self == parent.less:
+                parent.less = new
             else:
-                self.parent.more = new
+                parent.more = new
         if new is not None:
-            new.parent = self.parent
+            new.parent = parent
+        if parent:
+            parent._retrace()
+
+    @staticmethod
+    def _size(node: Optional["TreeNode"]) -> int:
+        return node.subtree_size if node else 0
+
+    def _update(self) -> None:
+        """recomputes the data a node keeps about its subtree from its children"""
+        self.subtree_size = self.count + self._size(self.less) + self._size(self.more)
+
+    def _retrace(self) -> None:
+        """called on the parent of every node that was linked in or out of the tree: walks up to the root
+        and updates the nodes on the way; a plain TreeNode doesn't balance itself, see AVLTreeNode"""
+        node = self
+        while node.item is not None:  # walk up until the root sentinel
+            node._update()
+            node = node.parent
+
+    def _built(self, count: int) -> None:
+        """called by Tree._build() on every new node with the number of nodes in its subtree
+        (which is also the number of items, unless Tree._build() corrects it for the counts)"""
+        self.subtree_size = count
+
+
+class AVLTreeNode(TreeNode):
+    """TreeNode that keeps the tree height-balanced (an AVL tree): the heights of the two subtrees
+    of any node differ by one at most, so the tree's depth stays O(log n) even for sorted input.
+    After every change, the heights are updated on the way up to the root and rotations restore the balance."""
+
+    @staticmethod
+    def _height(node: Optional["AVLTreeNode"]) -> int:
+        return node.height if node else 0
+
+    def _balance(self) -> int:
+        """positive if the less side is higher, negative if the more side is higher"""
+        return self._height(self.less) - self._height(self.more)
+
+    def _built(self, count: int) -> None:
+        super()._built(count)
+        # a perfectly balanced subtree of `count` nodes is floor(log2(count)) + 1 levels high
+        self.height = count.bit_length()
+
+    def _update(self) -> None:
+        super()._update()
+        self.height = 1 + max(self._height(self.less), self._height(self.more))  # a leaf has height 1
+
+    def _retrace(self) -> None:
+        node: Optional[AVLTreeNode] = self
+        while node is not None and node.item is not None:  # walk up until the root sentinel
+            node._update()
+            balance = node._balance()
+            if balance > 1:
+                if node.less._balance() < 0:  # less-more case needs a double rotation
+                    node.less._rotate_left()
+                node = node._rotate_right()
+            elif balance < -1:
+                if node.more._balance() > 0:  # more-less case needs a double rotation
+                    node.more._rotate_right()
+                node = node._rotate_left()
+            node = node.parent
+
+    def _link_into_parent(self, parent: "TreeNode", old: "TreeNode") -> None:
+        """puts self where `old` used to hang below `parent`"""
+        if parent.less is old:
+            parent.less = self
+        else:
+            parent.more = self
+        self.parent = parent
+
+    def _rotate_right(self) -> "AVLTreeNode":
+        """the less child takes the place of this node, which becomes its more child"""
+        parent, pivot = self.parent, self.less
+        self.less = pivot.more
+        if pivot.more:
+            pivot.more.parent = self
+        pivot._link_into_parent(parent, self)
+        pivot.more = self
+        self.parent = pivot
+        self._update()
+        pivot._update()
+        return pivot
+
+    def _rotate_left(self) -> "AVLTreeNode":
+        """the more child takes the place of this node, which becomes its less child"""
+        parent, pivot = self.parent, self.more
+        self.more = pivot.less
+        if pivot.less:
+            pivot.less.parent = self
+        pivot._link_into_parent(parent, self)
+        pivot.less = self
+        self.parent = pivot
+        self._update()
+        pivot._update()
+        return pivot
 
 
 print("############### Try Out ###############")
@@ -212,11 +814,20 @@ bt.discard("Number 3")  # Should be silent
 
 # add same value
 bt.add("Number 1")
-print(list(iter(bt))) # strange that this adds the new value and doesn't skip it
-# I think add() should be implemented in another way, because this is not set-like
+print(list(iter(bt))) # set mode (the default) skips it, like a set would
+
+# in multiset mode, the copies are counted in one node
+bt_multi = Tree(["Number 1", "Number 1", "Number 2"], multiset=True)
+bt_multi.add("Number 1")
+print(list(iter(bt_multi)), len(bt_multi), bt_multi.count("Number 1"))
 
 bt2 = Tree(["item",  "some other item", "yet another"])
 
 # union operator works since __ior__ is implemented in any Set type: https://docs.python.org/3.12/library/collections.abc.html#collections-abstract-base-classes
 union = bt | bt2
 print(list(union))
+
+# balanced mode: sorted input would turn the plain tree into a linked list of 1000 nodes,
+# the AVL tree stays only a few levels deep
+bt3 = Tree(range(1, 1001), balanced=True)
+print(bt3.root.more.height)
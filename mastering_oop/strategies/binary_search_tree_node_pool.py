@@ -0,0 +1,195 @@
+from array import array
+from collections.abc import MutableSet
+from typing import Any, Iterable, Iterator, List, Optional
+
+from mastering_oop.strategies.binary_search_tree_from_set import Comparable, distinct_sorted
+
+# A second backend for the binary search tree of binary_search_tree_from_set.py, with the same
+# MutableSet interface as Tree. Instead of one TreeNode object per item, with its __dict__ and
+# a weakref to the parent, the nodes live in a pool of parallel arrays: node i is described by
+# _items[i], _less[i], _more[i] and _parent[i], where the links are indices into the same arrays.
+# An item then costs one list slot (8 bytes) plus three 4 byte integers, instead of well over
+# 200 bytes for a TreeNode. Nodes that are removed go into a free list and are reused by the
+# next add(), so the arrays don't grow with every insert.
+# Like Tree, it's a set by default: adding an item that is == to one already there changes nothing.
+# With `multiset=True`, equal items are kept, each in a node of its own (on the less side), where Tree
+# would count them in one node.
+
+NIL = -1  # index that stands for "no node", like None for TreeNode links
+
+
+class PooledTree(MutableSet):
+    """binary search tree with the same behaviour as Tree, whose nodes are stored in parallel arrays
+    instead of TreeNode objects"""
+
+    def __init__(self, source: Optional[Iterable[Comparable]] = None, multiset: bool = False) -> None:
+        self._items: List[Optional[Comparable]] = []
+        self._less = array("i")
+        self._more = array("i")  # also links the free list
+        self._parent = array("i")
+        self._root = NIL
+        self._free = NIL  # first node of the free list
+        self.multiset = multiset
+        self.size = 0
+        if source is not None:
+            items = sorted(source)
+            self._build(items if multiset else distinct_sorted(items))
+
+    def _build(self, items: List[Comparable]) -> None:
+        """builds a perfectly balanced tree in O(n), like Tree._build(); since the items are sorted,
+        node i can simply hold items[i], and only the links need to be filled in"""
+        n = len(items)
+        self._items = items
+        self._less = array("i", [NIL]) * n
+        self._more = array("i", [NIL]) * n
+        self._parent = array("i", [NIL]) * n
+        less, more, parent = self._less, self._more, self._parent
+        self._root = n // 2 if n else NIL
+        stack = [(0, n, NIL)] if n else []  # slices items[lo:hi] whose middle node hangs below `up`
+        while stack:
+            lo, hi, up = stack.pop()
+            mid = (lo + hi) // 2
+            parent[mid] = up
+            if lo < mid:
+                less[mid] = (lo + mid) // 2
+                stack.append((lo, mid, mid))
+            if mid + 1 < hi:
+                more[mid] = (mid + 1 + hi) // 2
+                stack.append((mid + 1, hi, mid))
+        self._free = NIL
+        self.size = n
+
+    def _new_node(self, item: Comparable, up: int) -> int:
+        """takes a node from the free list, or appends a new one to the arrays"""
+        if self._free != NIL:
+            index = self._free
+            self._free = self._more[index]
+            self._items[index] = item
+            self._less[index] = self._more[index] = NIL
+            self._parent[index] = up
+        else:
+            index = len(self._items)
+            self._items.append(item)
+            self._less.append(NIL)
+            self._more.append(NIL)
+            self._parent.append(up)
+        return index
+
+    def _free_node(self, index: int) -> None:
+        self._items[index] = None  # don't keep the item alive
+        self._more[index] = self._free
+        self._free = index
+
+    def _find(self, item: Any) -> int:
+        items, less, more = self._items, self._less, self._more
+        node = self._root
+        while node != NIL:
+            here = items[node]
+            if item < here:
+                node = less[node]
+            elif here < item:
+                node = more[node]
+            elif here == item:
+                return node
+            else:  # equal in order, but not ==, like Hands of the same total: look at the rest of the run
+                return next((other for other in self._equal_run(node, item) if items[other] == item), NIL)
+        return NIL
+
+    def _equal_run(self, node: int, item: Any) -> Iterator[int]:
+        """the nodes below `node` (and itself) whose items are equal in order to `item`,
+        like TreeNode._equal_keys()"""
+        items, less, more = self._items, self._less, self._more
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node == NIL:
+                continue
+            lower, higher = items[node] < item, item < items[node]
+            if not lower and not higher:
+                yield node
+            if not lower:
+                stack.append(less[node])
+            if not higher:
+                stack.append(more[node])
+
+    def __contains__(self, item: Any) -> bool:
+        return self._find(item) != NIL
+
+    def add(self, item: Comparable) -> None:
+        items, less, more = self._items, self._less, self._more
+        node = self._root
+        if node == NIL:
+            self._root = self._new_node(item, NIL)
+        else:
+            checked = self.multiset  # in set mode, the run of items equal in order is searched for `item` once
+            while True:
+                if items[node] >= item:
+                    if not checked and not item < items[node]:
+                        checked = True
+                        if any(items[other] == item for other in self._equal_run(node, item)):
+                            return
+                    if less[node] == NIL:
+                        less[node] = self._new_node(item, node)
+                        break
+                    node = less[node]
+                else:
+                    if more[node] == NIL:
+                        more[node] = self._new_node(item, node)
+                        break
+                    node = more[node]
+        self.size += 1
+
+    def discard(self, item: Comparable) -> None:
+        node = self._find(item)
+        if node == NIL:
+            return
+        less, more = self._less, self._more
+        if less[node] != NIL and more[node] != NIL:  # two children: the successor takes over the item
+            successor = more[node]
+            while less[successor] != NIL:
+                successor = less[successor]
+            self._items[node] = self._items[successor]
+            node = successor
+        child = less[node] if less[node] != NIL else more[node]
+        up = self._parent[node]
+        if up == NIL:
+            self._root = child
+        elif less[up] == node:
+            less[up] = child
+        else:
+            more[up] = child
+        if child != NIL:
+            self._parent[child] = up
+        self._free_node(node)
+        self.size -= 1
+
+    def __iter__(self) -> Iterator[Comparable]:
+        """in-order traversal with an explicit stack of node indices"""
+        items, less, more = self._items, self._less, self._more
+        stack: List[int] = []
+        node = self._root
+        while stack or node != NIL:
+            while node != NIL:
+                stack.append(node)
+                node = less[node]
+            node = stack.pop()
+            yield items[node]
+            node = more[node]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+'''print("############### Try Out ###############")
+pt = PooledTree(["Number 3", "Number 1"])
+pt.add("Number 2")
+print(pt)
+pt.discard("Number 1")
+pt.add("Number 4")  # reuses the node that "Number 1" had
+print(pt, pt._items)
+print("Number 2" in pt, len(pt))
+pt.add("Number 2")  # already there
+print(len(pt), len(PooledTree(["Number 2", "Number 2"], multiset=True)))'''
@@ -0,0 +1,289 @@
+import threading
+from collections.abc import MutableSet, Set
+from contextlib import contextmanager
+from itertools import groupby
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from mastering_oop.strategies.binary_search_tree_from_set import Comparable
+
+# A variant of Tree (in set mode) that can be shared between threads: some threads read it, while others
+# write into it. Tree and TreeNode change their nodes in place, so a reader can see a half done
+# rotation, and an iterator that runs during an add() or discard() can skip or repeat items.
+#
+# Here, the nodes are never changed once they are created (a persistent AVL tree): an insert or a
+# delete copies only the nodes on the path from the root down to the change, O(log n) of them, and
+# links them to the unchanged subtrees of the old tree (path copying). The new root is then
+# published with a single attribute assignment, which is atomic, also on free-threaded builds.
+# So every root a reader gets hold of is a complete, consistent tree that never changes again:
+# - lookups, len() and iteration need no lock at all, they work on the root they read first.
+#   An iterator works on a snapshot and doesn't keep the writers waiting, however long it takes.
+#   Since readers never wait for each other, they scale with the cores of a free-threaded CPython.
+# - writers take the write side of a readers-writer lock, so that they don't overwrite each other's
+#   new roots. Readers only need its read side, if a group of reads must see the latest state
+#   with no write in between.
+# The nodes have no parent pointers (which couldn't be shared between versions), and since the tree
+# stays balanced, it's only O(log n) levels deep, so the recursion below stays shallow.
+
+
+class ReadWriteLock:
+    """any number of readers, or one writer at a time; a waiting writer keeps new readers out,
+    so that a steady stream of readers can't starve it. The lock isn't reentrant."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class PersistentNode:
+    """immutable AVL tree node; height and size of its subtree are computed once, when it's created"""
+
+    __slots__ = ("item", "less", "more", "height", "size")
+
+    def __init__(
+        self, item: Comparable, less: Optional["PersistentNode"] = None, more: Optional["PersistentNode"] = None
+    ) -> None:
+        self.item = item
+        self.less = less
+        self.more = more
+        self.height = 1 + max(_height(less), _height(more))
+        self.size = 1 + _size(less) + _size(more)
+
+    def __repr__(self) -> str:
+        return f"PersistentNode({self.item!r}, {self.less!r}, {self.more!r})"
+
+
+def _height(node: Optional[PersistentNode]) -> int:
+    return node.height if node else 0
+
+
+def _size(node: Optional[PersistentNode]) -> int:
+    return node.size if node else 0
+
+
+def _balanced(item: Comparable, less: Optional[PersistentNode], more: Optional[PersistentNode]) -> PersistentNode:
+    """a new node for `item` with the subtrees `less` and `more`, whose heights differ by two at most;
+    the rotations build new nodes instead of relinking old ones"""
+    if _height(less) > _height(more) + 1:
+        if _height(less.less) >= _height(less.more):  # single rotation to the right
+            return PersistentNode(less.item, less.less, PersistentNode(item, less.more, more))
+        pivot = less.more  # less-more case: double rotation
+        return PersistentNode(
+            pivot.item, PersistentNode(less.item, less.less, pivot.less), PersistentNode(item, pivot.more, more)
+        )
+    if _height(more) > _height(less) + 1:
+        if _height(more.more) >= _height(more.less):  # single rotation to the left
+            return PersistentNode(more.item, PersistentNode(item, less, more.less), more.more)
+        pivot = more.less  # more-less case: double rotation
+        return PersistentNode(
+            pivot.item, PersistentNode(item, less, pivot.less), PersistentNode(more.item, pivot.more, more.more)
+        )
+    return PersistentNode(item, less, more)
+
+
+def _insert(node: Optional[PersistentNode], item: Comparable) -> PersistentNode:
+    """the root of a new version with `item`; returns `node` itself if the item is there already"""
+    if node is None:
+        return PersistentNode(item)
+    if item < node.item:
+        less = _insert(node.less, item)
+        return node if less is node.less else _balanced(node.item, less, node.more)
+    if node.item < item:
+        more = _insert(node.more, item)
+        return node if more is node.more else _balanced(node.item, node.less, more)
+    return node
+
+
+def _delete(node: Optional[PersistentNode], item: Comparable) -> Optional[PersistentNode]:
+    """the root of a new version without `item`; returns `node` itself if the item isn't there"""
+    if node is None:
+        return None
+    if item < node.item:
+        less = _delete(node.less, item)
+        return node if less is node.less else _balanced(node.item, less, node.more)
+    if node.item < item:
+        more = _delete(node.more, item)
+        return node if more is node.more else _balanced(node.item, node.less, more)
+    if node.less is None:
+        return node.more
+    if node.more is None:
+        return node.less
+    least, more = _pop_least(node.more)  # the successor takes the place of the deleted item
+    return _balanced(least, node.less, more)
+
+
+def _pop_least(node: PersistentNode) -> Tuple[Comparable, Optional[PersistentNode]]:
+    if node.less is None:
+        return node.item, node.more
+    least, less = _pop_least(node.less)
+    return least, _balanced(node.item, less, node.more)
+
+
+def _build(items: List[Comparable], lo: int, hi: int) -> Optional[PersistentNode]:
+    """perfectly balanced tree of the sorted items[lo:hi] in O(n)"""
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    return PersistentNode(items[mid], _build(items, lo, mid), _build(items, mid + 1, hi))
+
+
+def _find(node: Optional[PersistentNode], item: Any) -> bool:
+    while node is not None:
+        if item < node.item:
+            node = node.less
+        elif node.item < item:
+            node = node.more
+        else:
+            return True
+    return False
+
+
+def _walk(root: Optional[PersistentNode], near: str = "less", far: str = "more") -> Iterator[Comparable]:
+    """in-order traversal of one version with an explicit stack; (far, near) walks in reverse"""
+    stack: List[PersistentNode] = []
+    node = root
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = getattr(node, near)
+        node = stack.pop()
+        yield node.item
+        node = getattr(node, far)
+
+
+class TreeSnapshot(Set):
+    """read-only view of one version of a ConcurrentTree, that never changes"""
+
+    def __init__(self, root: Optional[PersistentNode]) -> None:
+        self.root = root
+
+    def __contains__(self, item: Any) -> bool:
+        return _find(self.root, item)
+
+    def __iter__(self) -> Iterator[Comparable]:
+        return _walk(self.root)
+
+    def __reversed__(self) -> Iterator[Comparable]:
+        return _walk(self.root, "more", "less")
+
+    def __len__(self) -> int:
+        return _size(self.root)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+class ConcurrentTree(MutableSet):
+    """thread-safe sorted set with the interface of Tree (in set mode): writers are serialized by a
+    ReadWriteLock, readers and iterators work lock-free on an immutable snapshot of the tree"""
+
+    def __init__(self, source: Optional[Iterable[Comparable]] = None) -> None:
+        self.lock = ReadWriteLock()
+        self._root: Optional[PersistentNode] = None
+        if source is not None:
+            items = [item for item, _ in groupby(sorted(source))]  # sorted, without duplicates
+            self._root = _build(items, 0, len(items))
+
+    def snapshot(self) -> TreeSnapshot:
+        """the current version, which stays the same while writers go on"""
+        return TreeSnapshot(self._root)
+
+    def add(self, item: Comparable) -> None:
+        with self.lock.write_locked():
+            self._root = _insert(self._root, item)
+
+    def discard(self, item: Comparable) -> None:
+        with self.lock.write_locked():
+            self._root = _delete(self._root, item)
+
+    def update(self, items: Iterable[Comparable]) -> None:
+        """adds many items with a single acquisition of the lock"""
+        with self.lock.write_locked():
+            root = self._root
+            for item in items:
+                root = _insert(root, item)
+            self._root = root  # readers see all the new items at once, or none of them
+
+    def pop(self) -> Comparable:
+        """removes and returns the smallest item; the mixin's iter() and discard() could return
+        the same item to two threads"""
+        with self.lock.write_locked():
+            if self._root is None:
+                raise KeyError("pop from an empty tree")
+            item, self._root = _pop_least(self._root)
+            return item
+
+    def clear(self) -> None:
+        with self.lock.write_locked():
+            self._root = None
+
+    def __contains__(self, item: Any) -> bool:
+        return _find(self._root, item)
+
+    def __iter__(self) -> Iterator[Comparable]:
+        return _walk(self._root)  # the root is read once: the iterator works on that version
+
+    def __reversed__(self) -> Iterator[Comparable]:
+        return _walk(self._root, "more", "less")
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+'''print("############### Try Out ###############")
+ct = ConcurrentTree([3, 1, 2])
+snapshot = ct.snapshot()
+iterator = iter(ct)
+ct.add(4)
+ct.discard(1)
+print(list(ct), list(snapshot), list(iterator))  # the old version is still complete
+before = ct.snapshot()
+ct.discard(10)
+print(before.root is ct.snapshot().root)  # discard(10) found nothing to copy, the version stays'''
@@ -1,6 +1,14 @@
 from typing import List, cast, Any, Optional, Iterable, overload, Union, Iterator
+from array import array
+from itertools import repeat
+from operator import mul, sub
 import math
 
+import numpy as np
+
+from mastering_oop.strategies.running_stats import RunningStats
+from mastering_oop.strategies.stats_list_numpy import moments
+
 
 class StatsListLazy(list):
     """class extends list by inheriting from it and adding new methods: `mean` and `stdev`"""
@@ -14,8 +22,9 @@ class StatsListLazy(list):
 
     @property # lazy calculation
     def stdev(self) -> float:
-        n = len(self)
-        return math.sqrt(n * sum(x ** 2 for x in self) - sum(self) ** 2) / n
+        # two passes, but the deviations from the mean don't suffer from cancellation, see running_stats.py
+        mean = self.mean
+        return math.sqrt(sum((x - mean) ** 2 for x in self) / len(self))
 
 
 class StatsListEager(list):
@@ -24,22 +33,29 @@ class StatsListEager(list):
     see: https://docs.python.org/3.4/library/collections.abc.html#collections-abstract-base-classes"""
 
     def __init__(self, iterable: Optional[Iterable[float]]) -> None:
-        self.sum0 = 0  # len(self), sometimes called "N"
-        self.sum1 = 0.0  # sum(self)
-        self.sum2 = 0.0  # sum(x**2 for x in self)
+        self.stats = RunningStats()  # count, mean and the moments, updated with every change
         super().__init__(cast(Iterable[Any], iterable))
         for x in self:
             self._new(x)
 
     def _new(self, value: float) -> None:
-        self.sum0 += 1
-        self.sum1 += value
-        self.sum2 += value * value
+        self.stats.add(value)
 
     def _rmv(self, value: float) -> None:
-        self.sum0 -= 1
-        self.sum1 -= value
-        self.sum2 -= value * value
+        self.stats.remove(value)
+
+    # the running sums this class used to keep, now derived from the accumulator
+    @property
+    def sum0(self) -> int:  # len(self), sometimes called "N"
+        return self.stats.count
+
+    @property
+    def sum1(self) -> float:  # sum(self)
+        return self.stats.sum
+
+    @property
+    def sum2(self) -> float:  # sum(x**2 for x in self)
+        return self.stats.m2 + self.stats.count * self.stats.mean ** 2
 
     def insert(self, index: int, value: float) -> None:
         super().insert(index, value)
@@ -55,31 +71,32 @@ class StatsListEager(list):
         self._new(value)
 
     def extend(self, sequence: Iterable[float]) -> None:
+        # the new values are read back from the list: an iterator (e.g. a generator) can only be consumed once
+        start = len(self)
         super().extend(sequence)
-        for value in sequence:
+        for value in map(self.__getitem__, range(start, len(self))):
             self._new(value)
 
     def remove(self, value: float) -> None:
         super().remove(value)
         self._rmv(value)
 
-    def __iadd__(self, sequence: Iterable[float]) -> "StatsList2":
-        for v in sequence:
-            self.append(v)
+    def __iadd__(self, sequence: Iterable[float]) -> "StatsListEager":
+        self.extend(sequence)
         return self
 
-    def __add__(self, sequence: Iterable[float]) -> "StatsList2":
-        generic = super().__add__(cast(StatsList2, sequence))
-        result = StatsList2(generic)
+    def __add__(self, sequence: Iterable[float]) -> "StatsListEager":
+        generic = super().__add__(cast(List[Any], sequence))
+        result = self.__class__(generic)
         return result
 
     @property
     def mean(self) -> float:
-        return self.sum1 / self.sum0
+        return self.stats.mean
 
     @property
     def stdev(self) -> float:
-        return math.sqrt(self.sum0 * self.sum2 - self.sum1 * self.sum1) / self.sum0
+        return self.stats.stdev
 
 
 
@@ -108,13 +125,16 @@ class StatsListWithItemGetterSetterDeleter(StatsListEager):
         """condition on whether the indices are provided as an it or as a slice"""
         if isinstance(index, slice):
             start, stop, step = index.indices(len(self)) # read out indices from slice object
-            olds = [self[i] for i in range(start, stop, step)]
-            # run superclass method to keep old behaviour (we only want to change the dynamic calculation of _rmv and _new):
+            olds = self._stats_of(range(start, stop, step))
+            kept = len(self) - olds.count
+            # run superclass method to keep old behaviour (we only want to change the dynamic calculation of the stats);
+            # list consumes `value` once, so any iterable works, and the new values are read back from the list:
             super().__setitem__(index, value)
-            for x in olds:
-                self._rmv(x)
-            for x in value:
-                self._new(x)
+            if step == 1:
+                news = self._stats_of(range(start, start + len(self) - kept))
+            else: # an extended slice is replaced in place, with as many values
+                news = self._stats_of(range(start, stop, step))
+            self._replace_stats(olds, news)
         else:
             old = self[index]
             # run superclass method to keep old behaviour (we only want to change the dynamic calculation of _rmv and _new):
@@ -125,45 +145,107 @@ class StatsListWithItemGetterSetterDeleter(StatsListEager):
     def __delitem__(self, index: Union[int, slice]) -> None: # just a different way to do the type hints
     # Index may be a single integer, or a slice
         if isinstance(index, slice):
-            start, stop, step = index.indices(len(self))
-            olds = [self[i] for i in range(start, stop, step)]
+            olds = self._stats_of(range(*index.indices(len(self))))
             super().__delitem__(index)
-            for x in olds:
-                self._rmv(x)
+            self._replace_stats(olds, RunningStats())
         else:
             old = self[index]
             super().__delitem__(index)
             self._rmv(old)
 
+    def _stats_of(self, indices: range) -> RunningStats:
+        """the stats of the values at `indices`, which the stats of the whole list are then updated with in O(1);
+        the values are copied by list's own slicing, and every pass over them runs in C (sum, map, sumprod),
+        instead of one RunningStats.add() call per value"""
+        # a stop of -1 (from slice.indices() with a negative step) means "down to index 0" for a range,
+        # but "up to the last index" for a slice
+        stop = None if indices.stop < 0 else indices.stop
+        values = super().__getitem__(slice(indices.start, stop, indices.step))
+        n = len(values)
+        if not n:
+            return RunningStats()
+        mean = math.fsum(values) / n
+        deviations = list(map(sub, values, repeat(mean)))
+        squares = list(map(mul, deviations, deviations))
+        return RunningStats(
+            n, mean, math.fsum(squares), math.sumprod(squares, deviations), math.sumprod(squares, squares),
+            min(values), max(values),
+        )
+
+    def _replace_stats(self, olds: RunningStats, news: RunningStats) -> None:
+        """takes the removed values out of the stats and adds the new ones; if most of the values were removed,
+        the stats of the rest are recomputed instead, which costs no more than collecting the removed ones did
+        and avoids the rounding errors of subtracting a large part"""
+        if olds.count > len(self) - news.count:
+            self.stats = self._stats_of(range(len(self)))
+        else:
+            self.stats.subtract(olds).merge(news)
+
 
 class StatsListWrappingList:
     """class that only uses some of the methods, list() implements,
-    in this case only append and __getitem__"""
+    in this case only append and __getitem__;
+    the values are kept in an array('d') instead of a list: unboxed C doubles, 8 bytes each,
+    which other code (NumPy, struct, files) can read directly through the buffer protocol"""
 
     def __init__(self) -> None:
-        self._list: List[float] = list() # instantiate as empty list
-        self.sum0 = 0  # len(self), sometimes called "N"
-        self.sum1 = 0.  # sum(self)
-        self.sum2 = 0.  # sum(x**2 for x in self)
+        self._list = array("d") # instantiate as empty array of doubles
+        self.stats = RunningStats()
 
     def append(self, value: float) -> None:
-        self._list.append(value) # use the append() method from list object
-        self.sum0 += 1
-        self.sum1 += value
-        self.sum2 += value * value
+        self._list.append(value) # use the append() method from array object
+        self.stats.add(value)
+
+    def frombytes(self, data: bytes) -> None:
+        """appends the doubles in `data` (machine byte order, as written by tobytes()) in one bulk copy;
+        the stats of the new values are computed vectorized, over a NumPy view of them, and merged at once"""
+        start = len(self._list)
+        self._list.frombytes(data)
+        new = np.frombuffer(self._list, dtype=np.float64, offset=8 * start)
+        self.stats.merge(moments(new))
+        del new  # releases the export, so that the array can grow again
+
+    def tobytes(self) -> bytes:
+        return self._list.tobytes()
+
+    # the running sums, derived from the accumulator like in StatsListEager
+    @property
+    def sum0(self) -> int:
+        return self.stats.count
+
+    @property
+    def sum1(self) -> float:
+        return self.stats.sum
+
+    @property
+    def sum2(self) -> float:
+        return self.stats.m2 + self.stats.count * self.stats.mean ** 2
 
     # etc.
 
     def __getitem__(self, index: int) -> float:
         return self._list.__getitem__(index)
 
+    def __len__(self) -> int:
+        return len(self._list)
+
+    # the buffer protocol in Python code (PEP 688, Python 3.12): memoryview(), bytes(), struct.unpack_from(),
+    # np.asarray() and the like get a view of the array's memory instead of a copy.
+    # Like for array itself, the array can't grow while a view exists: append() raises BufferError then.
+    # The view is writable, but values changed through it aren't seen by the stats.
+    def __buffer__(self, flags: int) -> memoryview:
+        return memoryview(self._list)
+
+    def __release_buffer__(self, view: memoryview) -> None:
+        view.release()
+
     @property
     def mean(self) -> float:
-        return self.sum1 / self.sum0
+        return self.stats.mean
 
     @property
     def stdev(self) -> float:
-        return math.sqrt(self.sum0 * self.sum2 - self.sum1 * self.sum1) / self.sum0
+        return self.stats.stdev
 
     def __hash__(self):
         """because the object is mutable; otherwise the hash value would be a value,
@@ -225,8 +307,12 @@ print(f"stdev: {stats_list.stdev} \n")
 for ele in stats_list:
     print(ele)
 
-# this breaks, because we didn't implement __len__:
-try:
-    len(stats_list)
-except TypeError as e:
-    print(e)
+# __len__ is implemented now, and the values can be read without copying them, through the buffer protocol:
+print(len(stats_list))
+with memoryview(stats_list) as view:
+    print(view.format, view.tolist())
+
+# dump and load in bulk:
+loaded = StatsListWrappingList()
+loaded.frombytes(stats_list.tobytes())
+print(list(loaded), loaded.mean)
@@ -0,0 +1,147 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Iterator
+
+import numpy as np
+
+from mastering_oop.strategies.running_stats import RunningStats
+
+# Statistics split by a category (dealer upcard, player total, betting unit, ...) used to mean a dict
+# of StatsListEager objects, with one Python call, and one accumulator update, per value.
+# GroupedStats takes the keys and the values as two parallel arrays and does the group-by with NumPy:
+# np.unique() numbers the groups, np.bincount() sums per group (counts, sums, and then the powers of
+# the deviations from the group means, so the moments are computed without cancellation), and
+# np.minimum/np.maximum.reduceat() find the extremes over the values sorted by group. Python code runs
+# only once per group and batch, not once per value.
+# Every group keeps a RunningStats accumulator, so batches can be added one after another and the
+# GroupedStats of several partitions (threads, processes, files) can be merged.
+# A GroupedStats is a Mapping from the keys to GroupView objects, which have the statistics attributes
+# of the StatsList classes (mean, stdev, sum0, sum1, sum2, len()), so code that reads statistics from a
+# StatsList can read them from a group as well. The views are live: they show later batches, too.
+
+
+class GroupView:
+    """the statistics of one group, with the attributes of a StatsList (but not its values)"""
+
+    def __init__(self, key: Hashable, stats: RunningStats) -> None:
+        self.key = key
+        self.stats = stats
+
+    def __len__(self) -> int:
+        return self.stats.count
+
+    @property
+    def sum0(self) -> int:
+        return self.stats.count
+
+    @property
+    def sum1(self) -> float:
+        return self.stats.sum
+
+    @property
+    def sum2(self) -> float:
+        return self.stats.m2 + self.stats.count * self.stats.mean ** 2
+
+    @property
+    def mean(self) -> float:
+        return self.stats.mean
+
+    @property
+    def variance(self) -> float:
+        return self.stats.variance
+
+    @property
+    def stdev(self) -> float:
+        return self.stats.stdev
+
+    @property
+    def min(self) -> float:
+        return self.stats.min
+
+    @property
+    def max(self) -> float:
+        return self.stats.max
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.key!r}, count={self.stats.count}, mean={self.mean!r}, stdev={self.stdev!r})"
+
+
+class GroupedStats(Mapping):
+    """count, mean, variance and extremes of values per key, computed with a vectorized group-by"""
+
+    def __init__(self, keys: Any = None, values: Any = None) -> None:
+        self._groups: Dict[Hashable, RunningStats] = {}
+        if keys is not None:
+            self.add(keys, values)
+
+    def add(self, keys: Any, values: Any) -> None:
+        """adds a batch of values; keys[i] is the key of values[i]"""
+        keys = np.asarray(keys)
+        values = np.asarray(values, dtype=np.float64)
+        if keys.shape != values.shape or keys.ndim != 1:
+            raise ValueError("keys and values must be one-dimensional arrays of the same length")
+        if not len(values):
+            return
+        unique, groups = np.unique(keys, return_inverse=True)
+        counts = np.bincount(groups)
+        means = np.bincount(groups, weights=values) / counts
+        deviations = values - means[groups]
+        squares = deviations * deviations
+        m2 = np.bincount(groups, weights=squares)
+        m3 = np.bincount(groups, weights=squares * deviations)
+        m4 = np.bincount(groups, weights=squares * squares)
+        by_group = values[np.argsort(groups, kind="stable")]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        mins = np.minimum.reduceat(by_group, starts)
+        maxes = np.maximum.reduceat(by_group, starts)
+        # tolist() gives Python ints, floats and strs, for the keys and the accumulators
+        columns = (a.tolist() for a in (unique, counts, means, m2, m3, m4, mins, maxes))
+        for key, *moments in zip(*columns):
+            part = RunningStats(*moments)
+            if key in self._groups:
+                self._groups[key].merge(part)
+            else:
+                self._groups[key] = part
+
+    def merge(self, other: "GroupedStats") -> "GroupedStats":
+        """adds the groups of another partition, in O(1) per group"""
+        for key, stats in other._groups.items():
+            if key in self._groups:
+                self._groups[key].merge(stats)
+            else:
+                self._groups[key] = stats.copy()
+        return self
+
+    def __add__(self, other: "GroupedStats") -> "GroupedStats":
+        return self.__class__().merge(self).merge(other)
+
+    @property
+    def total(self) -> RunningStats:
+        """the statistics of all the values, of all the groups together"""
+        total = RunningStats()
+        for stats in self._groups.values():
+            total.merge(stats)
+        return total
+
+    def __getitem__(self, key: Hashable) -> GroupView:
+        return GroupView(key, self._groups[key])
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(sorted(self._groups))
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({', '.join(f'{key!r}: {self._groups[key].count}' for key in self)})"
+
+
+'''print("############### Try Out ###############")
+rng = np.random.default_rng(1)
+upcards = rng.integers(2, 12, size=100_000)  # the dealer's upcard of every hand, 11 is an ace
+payouts = rng.choice([-1.0, 1.0, 1.5], size=100_000, p=[0.49, 0.46, 0.05]) - (upcards >= 10) * 0.1
+by_upcard = GroupedStats(upcards[:50_000], payouts[:50_000])
+other_partition = GroupedStats(upcards[50_000:], payouts[50_000:])
+by_upcard.merge(other_partition)
+for upcard, group in by_upcard.items():
+    print(upcard, len(group), round(group.mean, 4), round(group.stdev, 4), group.min, group.max)
+print(by_upcard.total.mean, payouts.mean(), np.isclose(by_upcard.total.variance, payouts.var()))'''
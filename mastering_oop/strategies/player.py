@@ -19,3 +19,17 @@ class Player:
         if self.table.can_insure(self.hand):
             if self.game_strategy.insurance(self.hand):
                 self.table.insure(self.bet_strategy.bet())
+
+    def play_round(self) -> int:
+        """plays one hand to the end without printing and returns the net win (negative for a loss)"""
+        bet = self.bet_strategy.bet()
+        self.hand = self.table.deal()
+        hole_card = self.table.hole_card
+        while self.hand.total() < 21 and self.game_strategy.hit(self.hand):
+            self.table.hit(self.hand)
+        win = self.table.settle(self.hand, bet, hole_card)
+        if win > 0:
+            self.bet_strategy.record_win()
+        elif win < 0:
+            self.bet_strategy.record_loss()
+        return win
@@ -0,0 +1,150 @@
+import math
+from collections import deque
+from collections.abc import Sequence
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple, overload
+
+# Statistics over the last `capacity` values of a stream, e.g. the recent win rate of a strategy.
+# With StatsListEager, every new value would mean an append() plus a pop(0), which moves all the
+# other values of the list one place to the front, O(n). Here, the values are kept in a ring buffer:
+# a list of fixed size, in which the newest value overwrites the oldest one, so appending and
+# evicting are both O(1).
+# Mean and variance are updated with the sliding window version of Welford's update (a new value
+# replaces an old one). The rounding errors of those updates add up over a long stream, so once per
+# `capacity` appends, mean and variance are recomputed from the buffer, which is still O(1) per
+# value on average. For min and max, an update can't be computed from the old value alone: when
+# the maximum leaves the window, the next largest value is needed. So every extreme keeps a monotonic
+# deque of (position, value) candidates: a new value drops all candidates it dominates from the back
+# (they leave the window earlier and can never be the extreme again), and the candidate at the front,
+# the current extreme, is dropped when it leaves the window. Every value goes into and out of a deque
+# once, so that's amortized O(1) as well.
+
+
+class RollingStatsList(Sequence):
+    """the last `capacity` values appended, oldest first, with their rolling mean, variance, min and max"""
+
+    def __init__(self, capacity: int, iterable: Optional[Iterable[float]] = None) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._buffer: List[float] = [0.0] * capacity
+        self._count = 0  # values appended so far; the position of the next value in the stream
+        self._size = 0
+        self._mean = 0.0
+        self._m2 = 0.0  # sum of the squared deviations from the mean
+        self._mins: Deque[Tuple[int, float]] = deque()  # increasing values, the minimum in front
+        self._maxes: Deque[Tuple[int, float]] = deque()  # decreasing values, the maximum in front
+        if iterable is not None:
+            for value in iterable:
+                self.append(value)
+
+    def append(self, value: float) -> None:
+        """adds the value and evicts the oldest one if the window is full"""
+        slot = self._count % self.capacity
+        if self._size == self.capacity:
+            old = self._buffer[slot]
+            mean = self._mean + (value - old) / self._size
+            self._m2 += (value - old) * (value - mean + old - self._mean)
+            self._mean = mean
+            self._evict(self._count - self.capacity)
+        else:
+            self._size += 1
+            delta = value - self._mean
+            self._mean += delta / self._size
+            self._m2 += delta * (value - self._mean)
+        self._buffer[slot] = value
+        mins, maxes = self._mins, self._maxes
+        while mins and mins[-1][1] >= value:
+            mins.pop()
+        mins.append((self._count, value))
+        while maxes and maxes[-1][1] <= value:
+            maxes.pop()
+        maxes.append((self._count, value))
+        self._count += 1
+        if self._count % self.capacity == 0 and self._size == self.capacity:
+            self._recompute()
+
+    def _recompute(self) -> None:
+        """mean and variance from scratch, with two passes over the buffer"""
+        self._mean = math.fsum(self._buffer) / self._size
+        self._m2 = math.fsum((x - self._mean) ** 2 for x in self._buffer)
+
+    def _evict(self, position: int) -> None:
+        """the value at `position` in the stream has left the window"""
+        if self._mins[0][0] == position:
+            self._mins.popleft()
+        if self._maxes[0][0] == position:
+            self._maxes.popleft()
+
+    def popleft(self) -> float:
+        """removes and returns the oldest value, in O(1)"""
+        if not self._size:
+            raise IndexError("pop from an empty window")
+        position = self._count - self._size
+        value = self._buffer[position % self.capacity]
+        self._size -= 1
+        if self._size:
+            mean = self._mean - (value - self._mean) / self._size
+            self._m2 -= (value - self._mean) * (value - mean)
+            self._mean = mean
+        else:
+            self._mean = self._m2 = 0.0
+        self._evict(position)
+        return value
+
+    def __len__(self) -> int:
+        return self._size
+
+    @overload
+    def __getitem__(self, index: int) -> float:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[float]:
+        ...
+
+    def __getitem__(self, index):
+        """index 0 is the oldest value in the window"""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("window index out of range")
+        return self._buffer[(self._count - self._size + index) % self.capacity]
+
+    def __iter__(self) -> Iterator[float]:
+        start = (self._count - self._size) % self.capacity
+        for i in range(self._size):
+            yield self._buffer[(start + i) % self.capacity]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.capacity!r}, {list(self)!r})"
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        """population variance, like the stdev of the StatsList classes"""
+        return max(self._m2, 0.0) / self._size
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def min(self) -> float:
+        return self._mins[0][1]
+
+    @property
+    def max(self) -> float:
+        return self._maxes[0][1]
+
+
+'''print("############### Try Out ###############")
+window = RollingStatsList(3)
+for win in [1, -1, 1, 1, -1, -1, -1]:
+    window.append(win)
+    print(list(window), window.mean, window.stdev, window.min, window.max)
+print(window.popleft(), window)'''
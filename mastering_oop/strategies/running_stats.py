@@ -0,0 +1,199 @@
+import math
+from typing import Iterable
+
+# The StatsList classes used to keep three running sums: sum0 = n, sum1 = sum(x) and sum2 = sum(x**2),
+# and computed stdev = sqrt(n * sum2 - sum1**2) / n. That subtracts two huge, almost equal numbers
+# when the mean is large compared to the spread (like for a bankroll series): most of the digits
+# cancel out, the result is mostly rounding error and can even come out negative under the root.
+#
+# RunningStats keeps the mean and the sums of the powers of the deviations from the mean instead:
+# M2 = sum((x - mean)**2), M3 and M4 likewise. Those are updated with every new value (Welford's
+# algorithm), and they never subtract large numbers from each other.
+# Two accumulators of separate parts of the data can be merged into the accumulator of all of it in
+# O(1), exactly as if all the values had been added to one (Chan et al., extended to the third and
+# fourth moment by Pébay). So threads or processes can each keep their own and merge them at the end.
+# The formulas hold for any counts, also negative ones: removing values is merging with an
+# accumulator that holds them with a negative count, which is what subtract() does. For a single value,
+# remove() runs Welford's update backwards instead, which does much less work than the general merge.
+
+
+class RunningStats:
+    """numerically stable accumulator of count, mean, M2, M3, M4, min and max of a stream of values"""
+
+    def __init__(
+        self,
+        count: int = 0,
+        mean: float = 0.0,
+        m2: float = 0.0,
+        m3: float = 0.0,
+        m4: float = 0.0,
+        min: float = math.inf,
+        max: float = -math.inf,
+    ) -> None:
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.m3 = m3
+        self.m4 = m4
+        self.min = min  # math.nan if unknown, after the smallest value was removed
+        self.max = max
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> "RunningStats":
+        stats = cls()
+        for value in values:
+            stats.add(value)
+        return stats
+
+    def add(self, value: float) -> None:
+        """Welford's update, which is _combine(1, value, 0, 0, 0) written out for a single value"""
+        n1 = self.count
+        n = self.count = n1 + 1
+        delta = value - self.mean
+        delta_n = delta / n
+        delta_n2 = delta_n * delta_n
+        term1 = delta * delta_n * n1
+        self.mean += delta_n
+        self.m4 += term1 * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * self.m2 - 4 * delta_n * self.m3
+        self.m3 += term1 * delta_n * (n - 2) - 3 * delta_n * self.m2
+        self.m2 += term1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def remove(self, value: float) -> None:
+        """takes a value out again, with Welford's update run backwards (instead of _combine() with a count
+        of -1, which does the general work for two parts); if it was the smallest or the largest, min or max
+        become unknown (nan)"""
+        n = self.count
+        if n < 2:  # nothing left afterwards, or less than nothing
+            self._combine(-1, value, 0.0, 0.0, 0.0)
+        else:
+            n1 = self.count = n - 1
+            mean = self.mean - (value - self.mean) / n1  # the mean without the value
+            delta = value - mean
+            delta_n = delta / n
+            delta_n2 = delta_n * delta_n
+            term1 = delta * delta_n * n1
+            # add() computed the new moments from the old ones, so they are restored in the opposite order
+            m2 = self.m2 - term1
+            m3 = self.m3 - term1 * delta_n * (n - 2) + 3 * delta_n * m2
+            self.m4 -= term1 * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * m2 - 4 * delta_n * m3
+            self.mean, self.m2, self.m3 = mean, m2, m3
+        if not self.count:
+            self.min, self.max = math.inf, -math.inf
+            return
+        if value <= self.min:
+            self.min = math.nan
+        if value >= self.max:
+            self.max = math.nan
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """adds all the values of `other` in O(1)"""
+        self._combine(other.count, other.mean, other.m2, other.m3, other.m4)
+        # an unknown extreme (nan) stays unknown
+        self.min = math.nan if math.isnan(other.min) else min(self.min, other.min)
+        self.max = math.nan if math.isnan(other.max) else max(self.max, other.max)
+        return self
+
+    def subtract(self, other: "RunningStats") -> "RunningStats":
+        """takes all the values of `other`, a part of the values of self, out again in O(1): merging
+        with the negated counts and moments, like remove() does for a single value"""
+        self._combine(-other.count, other.mean, -other.m2, -other.m3, -other.m4)
+        if not self.count:
+            self.min, self.max = math.inf, -math.inf
+            return self
+        if not other.min > self.min:
+            self.min = math.nan
+        if not other.max < self.max:
+            self.max = math.nan
+        return self
+
+    def __add__(self, other: "RunningStats") -> "RunningStats":
+        return self.copy().merge(other)
+
+    def __sub__(self, other: "RunningStats") -> "RunningStats":
+        return self.copy().subtract(other)
+
+    def copy(self) -> "RunningStats":
+        return self.__class__(self.count, self.mean, self.m2, self.m3, self.m4, self.min, self.max)
+
+    def _combine(self, nb: int, mean_b: float, m2b: float, m3b: float, m4b: float) -> None:
+        """Pébay's pairwise formulas for the moments of the union of self and a second part b"""
+        na = self.count
+        n = na + nb
+        if n == 0:
+            self.count, self.mean, self.m2, self.m3, self.m4 = 0, 0.0, 0.0, 0.0, 0.0
+            return
+        if na == 0:
+            self.count, self.mean, self.m2, self.m3, self.m4 = nb, mean_b, m2b, m3b, m4b
+            return
+        delta = mean_b - self.mean
+        delta2 = delta * delta
+        m2a, m3a, m4a = self.m2, self.m3, self.m4
+        self.m4 = (
+            m4a
+            + m4b
+            + delta2 * delta2 * na * nb * (na * na - na * nb + nb * nb) / (n * n * n)
+            + 6 * delta2 * (na * na * m2b + nb * nb * m2a) / (n * n)
+            + 4 * delta * (na * m3b - nb * m3a) / n
+        )
+        self.m3 = m3a + m3b + delta * delta2 * na * nb * (na - nb) / (n * n) + 3 * delta * (na * m2b - nb * m2a) / n
+        self.m2 = m2a + m2b + delta2 * na * nb / n
+        self.mean += delta * nb / n
+        self.count = n
+
+    @property
+    def sum(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def variance(self) -> float:
+        """population variance, the one the StatsList classes always used for stdev"""
+        return max(self.m2, 0.0) / self.count
+
+    @property
+    def sample_variance(self) -> float:
+        return max(self.m2, 0.0) / (self.count - 1)
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def skewness(self) -> float:
+        return math.sqrt(self.count) * self.m3 / self.m2**1.5
+
+    @property
+    def kurtosis(self) -> float:
+        """excess kurtosis, 0 for a normal distribution"""
+        return self.count * self.m4 / (self.m2 * self.m2) - 3.0
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, RunningStats):
+            return NotImplemented
+        return (self.count, self.mean, self.m2, self.m3, self.m4, self.min, self.max) == (
+            other.count, other.mean, other.m2, other.m3, other.m4, other.min, other.max
+        )
+
+    __hash__ = None  # mutable
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(count={self.count!r}, mean={self.mean!r}, m2={self.m2!r}, "
+            f"m3={self.m3!r}, m4={self.m4!r}, min={self.min!r}, max={self.max!r})"
+        )
+
+
+'''print("############### Try Out ###############")
+# the mean is huge compared to the spread: the old formula loses everything to cancellation
+values = [1e9 + x for x in (4, 7, 13, 16)]
+n, sum1, sum2 = len(values), sum(values), sum(x * x for x in values)
+print((n * sum2 - sum1 * sum1) / (n * n), RunningStats.from_values(values).variance)  # the variance is 22.5
+
+# partials of two threads or processes, merged
+left, right = RunningStats.from_values(values[:2]), RunningStats.from_values(values[2:])
+print(left + right)
+left.remove(values[0])
+print(left)'''
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""Long running simulation of Player objects at a Table, that can be checkpointed and resumed."""
+
+import argparse
+import math
+import os
+import pickle
+import random
+import time
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union
+
+from mastering_oop.cards.card_factory_class import make_card
+from mastering_oop.strategies.player import Player
+from mastering_oop.strategies.running_stats import RunningStats
+from mastering_oop.strategies.strategy import BettingStrategy, Flat, GameStrategy
+from mastering_oop.strategies.table import Table
+
+# A checkpoint is the pickled Simulation object. Pickling it captures everything that
+# decides the remaining rounds: the table with the cards left in the deck (the shoe position),
+# the players with their strategies, the bankrolls, the partial aggregates and the simulation's own
+# random number generator (a random.Random instance) that shuffles the decks.
+# Resuming from it therefore gives exactly the same results as an uninterrupted run. Because the
+# generator isn't the global one of the random module, other code that draws random numbers, or
+# other simulations in the same process, don't change the results, and loading a checkpoint
+# doesn't change the global generator either.
+#
+# The file is written atomically: into a temporary file next to the target, which then replaces
+# the target with os.replace(). A preemption during the write leaves the previous checkpoint intact.
+#
+# How many rounds are enough depends on the variance of what is measured, which isn't known in advance.
+# run_until() plays batches of rounds until the confidence interval of a metric (by default the EV per
+# hand, from the running statistics of the wins) is narrower than a target width. The half width of the
+# interval is z * s / sqrt(n), with the sample standard deviation s and the z value of the confidence
+# level from the normal distribution, which is exact enough for the thousands of hands it's used with.
+# So halving the width takes four times the hands, and a strategy with a smaller variance stops earlier.
+
+
+def write_atomic(path: Union[str, Path], data: bytes, fsync: bool = False) -> None:
+    """replaces the file at `path` with `data` in one step; `fsync` also survives power losses,
+    but costs a lot more than the few milliseconds it takes to write the file otherwise"""
+    path = Path(path)
+    temporary = path.with_name(f".{path.name}.tmp")
+    with temporary.open("wb") as target:
+        target.write(data)
+        if fsync:
+            target.flush()
+            os.fsync(target.fileno())
+    os.replace(temporary, path)
+
+
+class StoppingRule:
+    """stops once the confidence interval of the metric (a RunningStats of the simulation) is narrower
+    than `width`, but not before `min_hands` values have been seen"""
+
+    def __init__(
+        self,
+        width: float,
+        confidence: float = 0.95,
+        min_hands: int = 1000,
+        metric: Callable[["Simulation"], RunningStats] = lambda simulation: simulation.stats,
+    ) -> None:
+        self.width = width
+        self.confidence = confidence
+        self.min_hands = min_hands
+        self.metric = metric
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    def interval(self, simulation: "Simulation") -> Tuple[float, float]:
+        """the confidence interval of the mean of the metric"""
+        stats = self.metric(simulation)
+        if stats.count < 2:
+            return -math.inf, math.inf
+        half_width = self.z * math.sqrt(stats.sample_variance / stats.count)
+        return stats.mean - half_width, stats.mean + half_width
+
+    def done(self, simulation: "Simulation") -> bool:
+        low, high = self.interval(simulation)
+        return self.metric(simulation).count >= self.min_hands and high - low < self.width
+
+
+class Simulation:
+    """plays rounds of blackjack for a number of players at one table and keeps their bankrolls
+    and the running statistics of the wins per hand (the same accumulator StatsListEager keeps)"""
+
+    def __init__(
+        self,
+        players: int = 1,
+        seed: Any = None,
+        func: Callable = make_card,
+        bet_strategy: Type[BettingStrategy] = Flat,
+        game_strategy: Type[GameStrategy] = GameStrategy,
+    ) -> None:
+        self.random = random.Random(seed)  # shuffles the decks of this simulation only
+        self.table = Table(func=func, rng=self.random)
+        self.players = [Player(self.table, bet_strategy(), game_strategy()) for _ in range(players)]
+        self.rounds = 0
+        self.bankrolls = [0] * players
+        self.stats = RunningStats()  # of the wins per hand
+
+    def play_round(self) -> None:
+        for i, player in enumerate(self.players):
+            win = player.play_round()
+            self.bankrolls[i] += win
+            self.stats.add(win)
+        self.rounds += 1
+
+    def run(
+        self, rounds: int, checkpoint: Optional[Union[str, Path]] = None, every: float = 5.0
+    ) -> "Simulation":
+        """plays until `rounds` rounds are done in total (also counting the rounds played before a
+        resume) and writes a checkpoint every `every` seconds and at the end"""
+        self._play(rounds, checkpoint, every, time.monotonic())
+        if checkpoint is not None:
+            self.save(checkpoint)
+        return self
+
+    def run_until(
+        self,
+        rule: StoppingRule,
+        batch: int = 1000,
+        max_rounds: Optional[int] = None,
+        checkpoint: Optional[Union[str, Path]] = None,
+        every: float = 5.0,
+    ) -> "Simulation":
+        """plays batches of `batch` rounds until the rule is satisfied (checked between the batches) or
+        `max_rounds` rounds are done; self.rounds then tells how many rounds it took"""
+        last = time.monotonic()
+        while not rule.done(self) and (max_rounds is None or self.rounds < max_rounds):
+            rounds = self.rounds + batch if max_rounds is None else min(self.rounds + batch, max_rounds)
+            last = self._play(rounds, checkpoint, every, last)
+        if checkpoint is not None:
+            self.save(checkpoint)
+        return self
+
+    def _play(self, rounds: int, checkpoint: Optional[Union[str, Path]], every: float, last: float) -> float:
+        """plays up to round `rounds`, with checkpoints; returns the time of the last checkpoint"""
+        while self.rounds < rounds:
+            self.play_round()
+            if checkpoint is not None and time.monotonic() - last >= every:
+                self.save(checkpoint)
+                last = time.monotonic()
+        return last
+
+    @property
+    def mean(self) -> float:
+        """expected value per hand"""
+        return self.stats.mean
+
+    @property
+    def stdev(self) -> float:
+        return self.stats.stdev
+
+    def results(self) -> Dict[str, Any]:
+        return dict(rounds=self.rounds, hands=self.stats.count, bankrolls=self.bankrolls, mean=self.mean, stdev=self.stdev)
+
+    def save(self, path: Union[str, Path], fsync: bool = False) -> None:
+        write_atomic(path, pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL), fsync=fsync)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Simulation":
+        with Path(path).open("rb") as source:
+            simulation = pickle.load(source)
+        if not isinstance(simulation, cls):
+            raise TypeError(f"{path} doesn't contain a {cls.__name__} checkpoint")
+        return simulation
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("blackjack simulation that can be checkpointed and resumed")
+    parser.add_argument("--rounds", type=int, default=100_000, help="total number of rounds (the maximum with --width)")
+    parser.add_argument("--width", type=float, default=None, help="stop once the 95%% interval of the EV per hand is narrower")
+    parser.add_argument("--players", type=int, default=1, help="players at the table")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random number generator")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="checkpoint file, resumed from if it exists")
+    parser.add_argument("--every", type=float, default=5.0, help="seconds between two checkpoints")
+    args = parser.parse_args()
+
+    if args.checkpoint is not None and args.checkpoint.exists():
+        simulation = Simulation.load(args.checkpoint)
+        print(f"resuming after round {simulation.rounds}")
+    else:
+        simulation = Simulation(players=args.players, seed=args.seed)
+    if args.width is None:
+        print(simulation.run(args.rounds, checkpoint=args.checkpoint, every=args.every).results())
+    else:
+        rule = StoppingRule(args.width)
+        simulation.run_until(rule, max_rounds=args.rounds, checkpoint=args.checkpoint, every=args.every)
+        print(simulation.results(), rule.interval(simulation))
+
+# can be run with `python -m mastering_oop.strategies.simulation --rounds 1000000 --seed 1 --checkpoint sim.pickle`
+# and, after an interruption, resumed with exactly the same command;
+# `--width 0.02` stops as soon as the EV per hand is known to ±0.01 (with 95% confidence), `--rounds` is the maximum then
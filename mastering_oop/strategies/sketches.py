@@ -0,0 +1,320 @@
+import math
+import random
+from abc import ABCMeta, abstractmethod
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Quantiles like p50, p95 and p99 of the payouts need the values in sorted order, but over billions of
+# rounds neither keeping nor sorting all the values is possible. A sketch is a small summary of a stream,
+# which answers quantile queries approximately, with memory that doesn't grow (or grows only very slowly)
+# with the length of the stream. All the sketches here are mergeable: the sketches of the parts of a
+# stream (e.g. from different threads or processes) combine into the sketch of the whole stream.
+#
+# - KLLSketch (Karnin, Lang and Liberty): keeps a hierarchy of compactors. Level h holds items that each
+#   stand for 2**h values of the stream; when a level is full, it's sorted and every other item moves up
+#   one level (with a random offset, so that the errors cancel out on average). Memory O(k log(n / k)).
+#   Error bound on the rank: the item returned for q has a rank within about ±1.65% of n of q * n, with
+#   99% confidence, for k=200; the error shrinks like 1/k. It works for any comparable values.
+# - FixedBinHistogram: counts per bin of equal width between lo and hi. Memory O(bins).
+#   Error bound on the value: for quantiles that fall between lo and hi, at most one bin width
+#   (the value is interpolated inside its bin); outside, only the min or the max seen can be returned.
+# - LogBinHistogram: bins whose bounds grow geometrically by gamma = (1 + a) / (1 - a), for positive and
+#   negative values separately (like DDSketch). Error bound on the value: every quantile is within the
+#   relative accuracy a of the exact one, for values of any magnitude. Memory O(log(max / min) / a),
+#   limited to max_bins per sign: beyond that, the bins of the smallest magnitudes are collapsed into one,
+#   and only quantiles that fall into the collapsed bin lose the guarantee.
+
+
+class Sketch(metaclass=ABCMeta):
+    """a mergeable summary of a stream of values that answers quantile queries"""
+
+    count = 0
+
+    @abstractmethod
+    def add(self, value: float) -> None:
+        ...
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    @abstractmethod
+    def merge(self, other: Any) -> "Sketch":
+        """adds the summary of `other`, which needs to be a sketch of the same kind and parameters"""
+
+    @abstractmethod
+    def quantile(self, q: float) -> float:
+        """approximately the value with a fraction `q` (0 <= q <= 1) of the values below it"""
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        return [self.quantile(q) for q in qs]
+
+    def _check(self, q: float) -> None:
+        if not 0 <= q <= 1:
+            raise ValueError(f"quantile {q} is not between 0 and 1")
+        if not self.count:
+            raise ValueError("no values in the sketch")
+
+
+class KLLSketch(Sketch):
+    """quantile sketch with about ±1.65% rank error (99% confidence) for k=200, see above"""
+
+    def __init__(self, k: int = 200, seed: Any = None) -> None:
+        self.k = k
+        self.compactors: List[List[float]] = [[]]  # level h holds items of weight 2**h
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._random = random.Random(seed)
+        self._size = 0  # items held in all the compactors
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, level: int) -> int:
+        """the capacities shrink geometrically from the top level down, so most of the memory is
+        spent on the top levels, which hold the items with the largest weights"""
+        depth = len(self.compactors) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def add(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.count += 1
+        self._size += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        while self._size >= self._max_size:
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    break
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+            items.sort()
+            leftover = [items.pop()] if len(items) % 2 else []
+            promoted = items[self._random.getrandbits(1) :: 2]  # half of the items, of twice the weight
+            self.compactors[level + 1].extend(promoted)
+            self._size -= len(items) - len(promoted)
+            items[:] = leftover
+            self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        if other.k != self.k:
+            raise ValueError("only sketches with the same k can be merged")
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for items, others in zip(self.compactors, other.compactors):
+            items.extend(others)
+        self.count += other.count
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self._size += other._size
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> float:
+        self._check(q)
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+        weighted = sorted((item, 1 << level) for level, items in enumerate(self.compactors) for item in items)
+        target, cumulative = q * self.count, 0
+        for item, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return item
+        return self.max
+
+
+class FixedBinHistogram(Sketch):
+    """histogram with `bins` bins of equal width between `lo` and `hi`; the error of a quantile between
+    lo and hi is one bin width at most"""
+
+    def __init__(self, lo: float, hi: float, bins: int = 100) -> None:
+        if not lo < hi:
+            raise ValueError("lo must be less than hi")
+        self.lo, self.hi, self.bins = lo, hi, bins
+        self.width = (hi - lo) / bins
+        self.counts = [0] * bins
+        self.below = 0  # values less than lo
+        self.above = 0  # values greater than or equal to hi
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        if value < self.lo:
+            self.below += 1
+        elif value >= self.hi:
+            self.above += 1
+        else:
+            self.counts[min(int((value - self.lo) / self.width), self.bins - 1)] += 1
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "FixedBinHistogram") -> "FixedBinHistogram":
+        if (other.lo, other.hi, other.bins) != (self.lo, self.hi, self.bins):
+            raise ValueError("only histograms with the same bins can be merged")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.below += other.below
+        self.above += other.above
+        self.count += other.count
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        self._check(q)
+        target = q * self.count
+        if target <= self.below:
+            return self.min
+        cumulative = self.below
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= target:
+                value = self.lo + (i + (target - cumulative) / n) * self.width  # interpolated inside the bin
+                return min(max(value, self.min), self.max)
+            cumulative += n
+        return self.max
+
+
+class LogBinHistogram(Sketch):
+    """histogram with logarithmic bins; every quantile is within `relative_accuracy` of the exact one"""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048, min_value: float = 1e-9) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.min_value = min_value  # magnitudes below count as zero
+        self.positive: Dict[int, int] = {}  # bin index -> count; bin i holds gamma**(i-1) < x <= gamma**i
+        self.negative: Dict[int, int] = {}  # the same for the magnitudes of the negative values
+        self._floors = {"positive": -math.inf, "negative": -math.inf}  # smallest bin left after collapsing
+        self.zeros = 0
+        self.count = 0
+
+    def _bin(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        """the point of bin `index` with the same relative distance to both of its bounds"""
+        return 2 * self.gamma**index / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if abs(value) < self.min_value:
+            self.zeros += 1
+            return
+        sign = "positive" if value > 0 else "negative"
+        store = getattr(self, sign)
+        index = max(self._bin(abs(value)), self._floors[sign])
+        store[index] = store.get(index, 0) + 1
+        if len(store) > self.max_bins:
+            self._collapse(sign)
+
+    def _collapse(self, sign: str) -> None:
+        """merges the bins of the smallest magnitudes, so that `max_bins` are left"""
+        store = getattr(self, sign)
+        indices = sorted(store)
+        floor = indices[-self.max_bins]
+        store[floor] += sum(store.pop(index) for index in indices[: -self.max_bins])
+        self._floors[sign] = floor
+
+    def merge(self, other: "LogBinHistogram") -> "LogBinHistogram":
+        if other.gamma != self.gamma:
+            raise ValueError("only histograms with the same relative accuracy can be merged")
+        for sign in ("positive", "negative"):
+            store = getattr(self, sign)
+            self._floors[sign] = max(self._floors[sign], other._floors[sign])
+            for index, n in getattr(other, sign).items():
+                index = max(index, self._floors[sign])
+                store[index] = store.get(index, 0) + n
+            if len(store) > self.max_bins:
+                self._collapse(sign)
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def _bins(self) -> Iterator[Tuple[float, int]]:
+        """(value, count) of all the bins in increasing order of the values"""
+        for index in sorted(self.negative, reverse=True):
+            yield -self._value(index), self.negative[index]
+        if self.zeros:
+            yield 0.0, self.zeros
+        for index in sorted(self.positive):
+            yield self._value(index), self.positive[index]
+
+    def quantile(self, q: float) -> float:
+        self._check(q)
+        rank = q * (self.count - 1)
+        cumulative = 0
+        for value, n in self._bins():
+            cumulative += n
+            if cumulative > rank:
+                return value
+        return value
+
+
+class SketchedStatsList:
+    """attaches named sketches to any StatsList variant: the values appended or extended go into
+    the list and into every sketch; everything else is passed on to the list.
+    The sketches only ever add values: values that are removed from or replaced in the list stay in them"""
+
+    def __init__(self, stats_list: Any, **sketches: Sketch) -> None:
+        self.stats_list = stats_list
+        self.sketches = sketches
+        for sketch in sketches.values():
+            sketch.update(stats_list)  # the values the list holds already
+
+    def append(self, value: float) -> None:
+        self.stats_list.append(value)
+        for sketch in self.sketches.values():
+            sketch.add(value)
+
+    def extend(self, values: Iterable[float]) -> None:
+        if not isinstance(values, Sequence) and not hasattr(values, "__array__"):
+            values = list(values)  # an iterator can only be consumed once, but it goes to several places
+        extend = getattr(self.stats_list, "extend", None)
+        if extend is None:  # StatsListWrappingList and RollingStatsList can only append
+            for value in values:
+                self.stats_list.append(value)
+        else:
+            extend(values)
+        for sketch in self.sketches.values():
+            sketch.update(values)
+
+    def quantile(self, q: float, sketch: Optional[str] = None) -> float:
+        """the quantile from the sketch named `sketch`, by default from the first one"""
+        return self.sketches[sketch or next(iter(self.sketches))].quantile(q)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stats_list, name)
+
+    def __len__(self) -> int:
+        return len(self.stats_list)
+
+    def __getitem__(self, index: Any) -> Any:
+        return self.stats_list[index]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.stats_list)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.stats_list!r}, {', '.join(self.sketches)})"
+
+
+'''print("############### Try Out ###############")
+from mastering_oop.strategies.stats_list_numpy import StatsListNumPy
+
+payouts = SketchedStatsList(StatsListNumPy(), kll=KLLSketch(seed=1), log=LogBinHistogram(), fixed=FixedBinHistogram(-4, 4, 80))
+rng = random.Random(1)
+payouts.extend(rng.choice([-1.0, -1.0, 1.0, 1.0, 1.5, 2.0]) * rng.lognormvariate(0, 0.3) for _ in range(100_000))
+print(payouts.mean, payouts.stdev)
+for name in payouts.sketches:
+    print(name, [round(payouts.quantile(q, name), 3) for q in (0.5, 0.95, 0.99)])
+print(sorted(payouts.values)[49_999], sorted(payouts.values)[94_999], sorted(payouts.values)[98_999])'''
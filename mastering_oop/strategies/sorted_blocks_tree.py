@@ -0,0 +1,127 @@
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableSet
+from itertools import chain
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from mastering_oop.strategies.binary_search_tree_from_set import Comparable, distinct_sorted
+
+# A third backend with the MutableSet interface of Tree, for read-heavy workloads.
+# In CPython, following one pointer per level of a binary tree means one attribute lookup and
+# one Python level comparison per level. A bisect over a contiguous list does its comparisons in C.
+# So instead of nodes, the items are kept in a list of sorted blocks (like the leaves of a B-tree,
+# or the layout of the sortedcontainers package): every block holds at most 2 * `load` items, and
+# `_maxes` holds the largest item of each block, so that a first bisect over `_maxes` finds the block
+# and a second bisect finds the position inside it. Inserting into a block moves at most 2 * `load`
+# pointers with a fast memmove; a block that gets too big is split in two.
+# Like Tree, it's a set by default: adding an item that is == to one already there changes nothing;
+# with `multiset=True`, equal items are kept next to each other.
+
+
+class SortedBlocksTree(MutableSet):
+    """sorted container with the behaviour of Tree, stored as a list of sorted blocks"""
+
+    def __init__(
+        self, source: Optional[Iterable[Comparable]] = None, load: int = 1000, multiset: bool = False
+    ) -> None:
+        self.load = load
+        self.multiset = multiset
+        self._blocks: List[List[Comparable]] = []
+        self._maxes: List[Comparable] = []
+        self.size = 0
+        if source is not None:
+            items = sorted(source)
+            if not multiset:
+                items = distinct_sorted(items)
+            self._blocks = [items[i:i + load] for i in range(0, len(items), load)]
+            self._maxes = [block[-1] for block in self._blocks]
+            self.size = len(items)
+
+    def _locate(self, item: Any) -> Optional[Tuple[int, int]]:
+        """the block and the position in it of an item == `item`; the items that are equal to it in order
+        (like Hands of the same total) may be different, so they are scanned, across blocks if need be"""
+        blocks = self._blocks
+        i = bisect_left(self._maxes, item)
+        if i == len(blocks):
+            return None
+        j = bisect_left(blocks[i], item)  # j < len(block), because block[-1] isn't less than item
+        if blocks[i][j] == item:
+            return i, j
+        while i < len(blocks):
+            block = blocks[i]
+            for j in range(j, len(block)):
+                if item < block[j]:
+                    return None
+                if block[j] == item:
+                    return i, j
+            i, j = i + 1, 0
+        return None
+
+    def __contains__(self, item: Any) -> bool:
+        return self._locate(item) is not None
+
+    def add(self, item: Comparable) -> None:
+        if not self.multiset and self._locate(item) is not None:
+            return
+        maxes, blocks = self._maxes, self._blocks
+        if not maxes:
+            blocks.append([item])
+            maxes.append(item)
+        else:
+            i = bisect_right(maxes, item)
+            if i == len(maxes):  # larger than everything: goes to the end of the last block
+                i -= 1
+                blocks[i].append(item)
+                maxes[i] = item
+            else:
+                insort(blocks[i], item)
+            if len(blocks[i]) > 2 * self.load:
+                self._split(i)
+        self.size += 1
+
+    def _split(self, i: int) -> None:
+        block = self._blocks[i]
+        half = block[self.load:]
+        del block[self.load:]
+        self._blocks.insert(i + 1, half)
+        self._maxes[i] = block[-1]
+        self._maxes.insert(i + 1, half[-1])
+
+    def discard(self, item: Comparable) -> None:
+        found = self._locate(item)
+        if found is None:
+            return
+        i, j = found
+        block = self._blocks[i]
+        del block[j]
+        self.size -= 1
+        if not block:  # empty blocks are dropped, small ones are kept, which is good enough for a set
+            del self._blocks[i]
+            del self._maxes[i]
+        else:
+            self._maxes[i] = block[-1]
+
+    def __iter__(self) -> Iterator[Comparable]:
+        return chain.from_iterable(self._blocks)
+
+    def __reversed__(self) -> Iterator[Comparable]:
+        return chain.from_iterable(reversed(block) for block in reversed(self._blocks))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+
+'''print("############### Try Out ###############")
+st = SortedBlocksTree(range(10), load=2)  # tiny blocks, so that we can see them
+print(st._blocks, st._maxes)
+st.add(4.5)
+st.add(4.7)
+print(st._blocks)
+st.discard(9)
+st.discard(8)
+print(st._blocks, st._maxes)
+print(4.5 in st, 8 in st, len(st))
+st.add(4.5)  # already there
+print(len(st), len(SortedBlocksTree([1, 1, 1], multiset=True)))'''
@@ -0,0 +1,198 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Union, overload
+
+import numpy as np
+
+from mastering_oop.strategies.running_stats import RunningStats
+from mastering_oop.strategies.stats_list_numpy import moments
+
+# For series that don't fit into memory, the values are kept in a file, which is memory-mapped for
+# reading: the operating system loads the pages that are accessed and can drop them again at any time,
+# so only the pages that are used take up memory, and the file can be larger than the RAM.
+# The list is append-only, so that the file only ever grows at the end:
+# - appends go into a small in-memory buffer first, and are written to the file in one write() per
+#   `buffer_size` values (or on flush()), instead of one system call per value;
+# - the statistics are kept up to date with every append, in a RunningStats accumulator;
+# - recompute() computes them again from the file, in chunks of `chunk_size` values: every chunk is a
+#   vectorized NumPy computation, and the accumulators of the chunks are merged, so memory stays bounded;
+# - the file starts with a small header, which holds the number of values and the state of the
+#   accumulator. So reopening a file takes the same time however large it is, nothing is rescanned.
+#   The header is written after the values it describes: if the program dies in between, the values
+#   after the count in the header are simply ignored on the next open.
+#
+# File layout, all little-endian: the header (magic, count, mean, M2, M3, M4, min, max), padded to
+# 64 bytes, then the values as float64.
+
+
+class StatsListMemoryMapped(Sequence):
+    """append-only list of floats in a memory-mapped file, with statistics cached in the file's header"""
+
+    MAGIC = b"STATSLS1"
+    HEADER = struct.Struct("<8sq6d")
+    HEADER_SIZE = 64  # the values start 8-byte aligned, leaving some room in the header
+
+    def __init__(self, path: Union[str, Path], buffer_size: int = 65536) -> None:
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self._pending = array("d")  # appended, but not written to the file yet
+        if self.path.exists():
+            self._file = open(self.path, "r+b")
+            try:
+                self._size, self.stats = self._read_header()
+            except ValueError:
+                self._file.close()
+                raise
+        else:
+            self._file = open(self.path, "w+b")
+            self._size, self.stats = 0, RunningStats()
+            self._write_header()
+        self._map = None  # the memory map of the first `_mapped` values, created when values are read
+        self._mapped = -1
+
+    def _read_header(self) -> Any:
+        data = self._file.read(self.HEADER.size)
+        if len(data) < self.HEADER.size or data[:8] != self.MAGIC:
+            raise ValueError(f"{self.path} is not a StatsListMemoryMapped file")
+        _, count, mean, m2, m3, m4, min_, max_ = self.HEADER.unpack(data)
+        if os.fstat(self._file.fileno()).st_size < self.HEADER_SIZE + 8 * count:
+            raise ValueError(f"{self.path} is shorter than its header says")
+        return count, RunningStats(count, mean, m2, m3, m4, min_, max_)
+
+    def _write_header(self) -> None:
+        s = self.stats
+        self._file.seek(0)
+        self._file.write(self.HEADER.pack(self.MAGIC, self._size, s.mean, s.m2, s.m3, s.m4, s.min, s.max).ljust(self.HEADER_SIZE, b"\0"))
+
+    def append(self, value: float) -> None:
+        self._pending.append(value)
+        self.stats.add(value)
+        if len(self._pending) >= self.buffer_size:
+            self.flush()
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.append(value)
+
+    def __iadd__(self, values: Iterable[float]) -> "StatsListMemoryMapped":
+        self.extend(values)
+        return self
+
+    def flush(self) -> None:
+        """writes the buffered values, then the header that includes them"""
+        if self._pending:
+            if sys.byteorder == "big":
+                self._pending.byteswap()
+            self._file.seek(self.HEADER_SIZE + 8 * self._size)
+            self._file.write(self._pending.tobytes())
+            self._size += len(self._pending)
+            self._pending = array("d")
+        self._write_header()
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+        self._map = None  # closed when the last view of it is gone
+
+    def __enter__(self) -> "StatsListMemoryMapped":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def values(self) -> np.ndarray:
+        """all the values as a read-only NumPy array, backed by the memory map, not loaded into memory"""
+        self.flush()
+        return self._view()
+
+    def _view(self) -> np.ndarray:
+        """the values written to the file so far, without flushing the buffer"""
+        if self._mapped != self._size:
+            # a new map for the grown file; the old one stays open as long as arrays still use it
+            self._map = mmap.mmap(self._file.fileno(), self.HEADER_SIZE + 8 * self._size, access=mmap.ACCESS_READ)
+            self._mapped = self._size
+        return np.frombuffer(self._map, dtype="<f8", count=self._size, offset=self.HEADER_SIZE)
+
+    def recompute(self, chunk_size: int = 1 << 20) -> RunningStats:
+        """the statistics computed from the file again, one chunk at a time; they replace the cached ones,
+        which may have collected rounding errors over many appends"""
+        values = self.values
+        stats = RunningStats()
+        for start in range(0, len(values), chunk_size):
+            stats.merge(moments(values[start : start + chunk_size]))
+        self.stats = stats
+        self._write_header()
+        self._file.flush()
+        return stats
+
+    def __len__(self) -> int:
+        return self._size + len(self._pending)
+
+    @overload
+    def __getitem__(self, index: int) -> float:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> np.ndarray:
+        ...
+
+    def __getitem__(self, index):
+        """an int gives a float, a slice gives a NumPy array, copied into memory"""
+        if isinstance(index, slice):
+            return self.values[index].copy()
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        if index >= self._size:
+            return self._pending[index - self._size]
+        return float(self._view()[index])
+
+    def __iter__(self) -> Iterator[float]:
+        """converts the values to Python floats in chunks, like StatsListNumPy"""
+        values = self.values
+        for start in range(0, len(values), 65536):
+            yield from values[start : start + 65536].tolist()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({str(self.path)!r}, len={len(self)})"
+
+    @property
+    def mean(self) -> float:
+        return self.stats.mean
+
+    @property
+    def stdev(self) -> float:
+        """population standard deviation, like the other StatsLists"""
+        return self.stats.stdev
+
+    @property
+    def min(self) -> float:
+        return self.stats.min
+
+    @property
+    def max(self) -> float:
+        return self.stats.max
+
+
+'''print("############### Try Out ###############")
+import random
+import tempfile
+
+path = Path(tempfile.mkdtemp()) / "payouts.stats"
+with StatsListMemoryMapped(path, buffer_size=1000) as payouts:
+    payouts.extend(random.gauss(0, 1) for _ in range(10_000))
+    print(payouts, payouts.mean, payouts.stdev, payouts[-1], payouts[:3])
+
+with StatsListMemoryMapped(path) as payouts:  # instant: the statistics come from the header
+    print(payouts, payouts.mean, payouts.stdev)
+    print(payouts.recompute(chunk_size=4096))  # the same, computed again from the values in the file
+print(path.stat().st_size)'''
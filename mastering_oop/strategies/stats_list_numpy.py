@@ -0,0 +1,210 @@
+from collections.abc import MutableSequence
+from typing import Any, Iterable, Iterator, Optional, Union, overload
+
+import numpy as np
+
+from mastering_oop.strategies.running_stats import RunningStats
+
+# StatsListLazy keeps its values in a list: every value is a float object of 24 bytes plus an 8 byte
+# pointer in the list, and mean and stdev loop over all of them in Python, stdev even three times.
+# StatsListNumPy keeps the values unboxed in a float64 NumPy array instead, 8 bytes each, and
+# computes the statistics with vectorized NumPy functions, which run in C.
+# A NumPy array can't grow in place, so (like list does internally) the buffer is allocated with
+# some spare capacity and only reallocated, to twice its size, when it's full. That way appending
+# n values costs O(n) in total (amortized O(1) per value), instead of copying the array every time.
+# The class is a MutableSequence: with __getitem__, __setitem__, __delitem__, __len__ and insert,
+# the abstract base class adds the other list methods (index, count, remove, reverse, ...).
+
+
+def moments(values: np.ndarray) -> RunningStats:
+    """the accumulator of an array of values, computed with vectorized NumPy functions"""
+    if not len(values):
+        return RunningStats()
+    mean = values.mean()
+    deviations = values - mean
+    squares = deviations * deviations
+    return RunningStats(
+        len(values),
+        float(mean),
+        float(squares.sum()),
+        float((squares * deviations).sum()),
+        float((squares * squares).sum()),
+        float(values.min()),
+        float(values.max()),
+    )
+
+
+class StatsListNumPy(MutableSequence):
+    """list of floats stored in a growable float64 NumPy buffer, with vectorized statistics"""
+
+    def __init__(self, iterable: Optional[Iterable[float]] = None, capacity: int = 16) -> None:
+        self._data = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        if iterable is not None:
+            self.extend(iterable)
+
+    @property
+    def values(self) -> np.ndarray:
+        """the values as a NumPy array; it's a view of the buffer, not a copy, so it's only valid
+        until the list grows next time, and changing it changes the list"""
+        return self._data[: self._size]
+
+    def _reserve(self, size: int) -> None:
+        """makes sure the buffer can hold `size` values"""
+        if size > len(self._data):
+            data = np.empty(max(size, 2 * len(self._data)), dtype=np.float64)
+            data[: self._size] = self._data[: self._size]
+            self._data = data
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: float) -> None:
+        self._reserve(self._size + 1)
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values: Iterable[float]) -> None:
+        """one vectorized copy for arrays and sequences, the iterable is consumed only once otherwise"""
+        if isinstance(values, StatsListNumPy):
+            values = values.values
+        if isinstance(values, (np.ndarray, list, tuple)):
+            new = np.asarray(values, dtype=np.float64)
+        else:
+            new = np.fromiter(values, dtype=np.float64)
+        self._reserve(self._size + len(new))
+        self._data[self._size : self._size + len(new)] = new
+        self._size += len(new)
+
+    def __iadd__(self, values: Iterable[float]) -> "StatsListNumPy":
+        self.extend(values)
+        return self
+
+    def _index(self, index: int) -> int:
+        """like list, negative indices count from the end, the others raise IndexError"""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("list index out of range")
+        return index
+
+    @overload
+    def __getitem__(self, index: int) -> float:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "StatsListNumPy":
+        ...
+
+    def __getitem__(self, index):
+        """an int gives a float, a slice gives a new StatsListNumPy, like slicing a list gives a new list"""
+        if isinstance(index, slice):
+            return self.__class__(self.values[index].copy())
+        return float(self._data[self._index(index)])
+
+    @overload
+    def __setitem__(self, index: int, value: float) -> None:
+        ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[float]) -> None:
+        ...
+
+    def __setitem__(self, index, value) -> None:
+        if not isinstance(index, slice):
+            self._data[self._index(index)] = value
+            return
+        new = np.asarray(value if isinstance(value, (np.ndarray, list, tuple)) else list(value), dtype=np.float64)
+        start, stop, step = index.indices(self._size)
+        if step != 1:  # an extended slice must keep its length, like for a list
+            if len(new) != len(range(start, stop, step)):
+                raise ValueError(
+                    f"attempt to assign sequence of size {len(new)} to extended slice of size {len(range(start, stop, step))}"
+                )
+            self.values[index] = new
+            return
+        stop = max(start, stop)
+        tail = self._data[stop : self._size].copy()
+        self._reserve(start + len(new) + len(tail))
+        self._data[start : start + len(new)] = new
+        self._data[start + len(new) : start + len(new) + len(tail)] = tail
+        self._size = start + len(new) + len(tail)
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        if isinstance(index, slice):
+            keep = np.ones(self._size, dtype=bool)
+            keep[index] = False
+            kept = self.values[keep]
+            self._data[: len(kept)] = kept
+            self._size = len(kept)
+        else:
+            index = self._index(index)
+            self._data[index : self._size - 1] = self._data[index + 1 : self._size]  # NumPy handles the overlap
+            self._size -= 1
+
+    def insert(self, index: int, value: float) -> None:
+        index = min(max(index + self._size if index < 0 else index, 0), self._size)  # clamped like list.insert
+        self._reserve(self._size + 1)
+        self._data[index + 1 : self._size + 1] = self._data[index : self._size]
+        self._data[index] = value
+        self._size += 1
+
+    def pop(self, index: int = -1) -> float:
+        """like list.pop(), the last value by default, which is O(1)"""
+        value = self[index]
+        del self[index]
+        return value
+
+    def __iter__(self) -> Iterator[float]:
+        """converts the values to Python floats in chunks, so that no big list is created at once"""
+        for start in range(0, self._size, 65536):
+            yield from self._data[start : min(start + 65536, self._size)].tolist()
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, StatsListNumPy):
+            return bool(np.array_equal(self.values, other.values))
+        if isinstance(other, list):
+            return self.values.tolist() == other
+        return NotImplemented
+
+    __hash__ = None  # mutable, like list
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.values.tolist()!r})"
+
+    @property
+    def mean(self) -> float:
+        return float(self.values.mean())
+
+    @property
+    def stdev(self) -> float:
+        """population standard deviation, like StatsListLazy.stdev; NumPy subtracts the mean before
+        squaring, which is more accurate than the sum of the squares"""
+        return float(self.values.std())
+
+    @property
+    def stats(self) -> RunningStats:
+        """the moments computed with NumPy in a few passes, as an accumulator that can be merged with
+        the accumulators of other parts of the data"""
+        return moments(self.values)
+
+    @property
+    def min(self) -> float:
+        return float(self.values.min())
+
+    @property
+    def max(self) -> float:
+        return float(self.values.max())
+
+
+'''print("############### Try Out ###############")
+stats_list = StatsListNumPy([1, 4, 3], capacity=4)
+stats_list.append(0)
+stats_list.extend(range(5, 8))
+print(stats_list, len(stats_list), len(stats_list._data))  # capacity grows by doubling
+print(f"mean: {stats_list.mean}, stdev: {stats_list.stdev}, min: {stats_list.min}, max: {stats_list.max}")
+print(stats_list[1], stats_list[-1], stats_list[::2])
+stats_list[1:3] = [10, 20, 30]
+del stats_list[::3]
+print(stats_list, stats_list.index(20.0))
+print(stats_list.pop(), stats_list)'''
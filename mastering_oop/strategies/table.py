@@ -1,3 +1,7 @@
+import random
+from typing import Optional
+
+from mastering_oop.cards.card_polymorphic import Card
 from mastering_oop.cards.deck import DeckExtended
 from mastering_oop.hands.hand import Hand
 from mastering_oop.strategies.strategy import BettingStrategy, GameStrategy
@@ -6,23 +10,66 @@ from mastering_oop.strategies.strategy import BettingStrategy, GameStrategy
 class Table:
     """tracks the state of the game"""
 
-    def __init__(self, func) -> None:
-        self.deck = DeckExtended(func=func)
+    def __init__(self, func, rng: Optional[random.Random] = None) -> None:
+        self.func = func  # card factory, we need it again whenever the deck is reshuffled
+        self.rng = rng  # shuffles the decks; None for the global random number generator
+        self.deck = DeckExtended(func=func, rng=rng)
 
     def place_bet(self, amount: int) -> None:
         print("Bet", amount)
 
     def get_hand(self) -> Hand:
+        self.hand = self.deal()
+        print("Deal", self.hand)
+        return self.hand
+
+    def deal(self) -> Hand:
+        """deals a new hand (dealer card plus two player cards) and keeps the dealer's hole card;
+        unlike get_hand() it doesn't print, so it can be used when many hands are dealt"""
         try:
-            self.hand = Hand(self.deck.pop(), self.deck.pop(), self.deck.pop())
+            hand = Hand(self.deck.pop(), self.deck.pop(), self.deck.pop())
             self.hole_card = self.deck.pop()
         except IndexError:
             # Out of cards: need to shuffle.
             # This is not technically correct: cards currently in play should not appear in the next deck.
-            self.deck = DeckExtended(func=make_cards_with_factory_function)
-            return self.get_hand()
-        print("Deal", self.hand)
-        return self.hand
+            self.deck = DeckExtended(func=self.func, rng=self.rng)
+            return self.deal()
+        return hand
+
+    def draw(self) -> Card:
+        """pops a single card and reshuffles if the deck runs empty"""
+        if not self.deck:
+            self.deck = DeckExtended(func=self.func, rng=self.rng)
+        return self.deck.pop()
+
+    def hit(self, hand: Hand) -> Hand:
+        hand.card_append(self.draw())
+        return hand
 
     def can_insure(self, hand: Hand) -> bool:
         return hand.dealer_card.insure
+
+    def insure(self, amount: int) -> None:
+        print("Insure", amount)
+
+    def dealer_hand(self, hand: Hand, hole_card: Optional[Card] = None) -> Hand:
+        """reveals the hole card and draws for the dealer until they reach 17 or more;
+        the hole card can be passed in, because several hands may be dealt before one gets settled"""
+        hole_card = hole_card if hole_card is not None else self.hole_card
+        dealer = Hand(hand.dealer_card, hand.dealer_card, hole_card)
+        while dealer.total() < 17:
+            self.hit(dealer)
+        return dealer
+
+    def settle(self, hand: Hand, bet: int, hole_card: Optional[Card] = None) -> int:
+        """returns the player's net win (or loss, if negative) for a finished hand;
+        a bust loses without the dealer having to play (simplified: no blackjack bonus, no splits)"""
+        player_total = hand.total()
+        if player_total > 21:
+            return -bet
+        dealer_total = self.dealer_hand(hand, hole_card).total()
+        if dealer_total > 21 or player_total > dealer_total:
+            return bet
+        if player_total < dealer_total:
+            return -bet
+        return 0  # push
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+"""Asyncio game service that hosts many Table objects on a single event loop,
+plus an async client harness to stress-test betting and game strategies against it."""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, List, Optional, Sequence
+
+from mastering_oop.cards.card_factory_class import make_card
+from mastering_oop.cards.card_polymorphic import Card
+from mastering_oop.hands.hand import Hand
+from mastering_oop.strategies.table import Table
+
+# Protocol: line-delimited JSON over TCP or a Unix socket. Every request is one JSON object
+# on a single line, every response is one JSON object on a single line, in the same order:
+#
+#   -> {"action": "join", "table": 3}       <- {"ok": true, "table": 3, "bankroll": 0}
+#   -> {"action": "bet", "amount": 1}       <- {"ok": true, "cards": [...], "dealer": "K♠", "total": 15, "done": false}
+#   -> {"action": "hit"}                    <- {"ok": true, "cards": [...], "total": 25, "done": true, "win": -1, ...}
+#   -> {"action": "stand"}                  <- {"ok": true, ..., "done": true, "win": 1, "bankroll": 2}
+#   -> {"action": "quit"}                   <- {"ok": true, "bankroll": -3}
+#
+# Errors (a line that isn't a JSON object, an unknown action, an action that isn't allowed in the
+# current state, like a bet of 0 or joining another table during a hand) are answered with
+# {"ok": false, "error": "..."} and the connection stays open.
+#
+# All the tables live on one event loop, so every request is handled synchronously between two
+# awaits; that's why the tables and sessions need no locks, even though they are shared.
+
+
+class ProtocolError(Exception):
+    """a request that can't be handled in the current state of the session"""
+
+
+class Session:
+    """state of one connected client: the table they joined and the hand that's in play"""
+
+    def __init__(self, server: "TableServer") -> None:
+        self.server = server
+        self.table: Optional[Table] = None
+        self.hand: Optional[Hand] = None
+        self.hole_card: Optional[Card] = None
+        self.bet = 0
+        self.bankroll = 0
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """dispatches a request to the method named like its action"""
+        if not isinstance(request, dict):  # valid JSON, but e.g. a list or a number
+            raise ProtocolError("a request must be a JSON object")
+        action = request.get("action")
+        method = getattr(self, f"do_{action}", None)
+        if method is None:
+            raise ProtocolError(f"unknown action {action!r}")
+        return method(request)
+
+    def do_join(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if self.hand is not None:
+            raise ProtocolError("finish the current hand first")
+        table_id = self._integer(request, "table", 0) % len(self.server.tables)
+        self.table = self.server.tables[table_id]
+        return {"table": table_id, "bankroll": self.bankroll}
+
+    def do_bet(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        table = self._current_table()
+        if self.hand is not None:
+            raise ProtocolError("finish the current hand first")
+        amount = self._integer(request, "amount", 1)
+        if amount <= 0:
+            raise ProtocolError("the bet must be positive")
+        self.bet = amount
+        self.hand = table.deal()
+        self.hole_card = table.hole_card  # other sessions at this table will deal over it
+        return self._state(dealer=str(self.hand.dealer_card))
+
+    def do_hit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        hand = self._current_hand()
+        self._current_table().hit(hand)
+        if hand.total() > 21:
+            return self._finish()
+        return self._state()
+
+    def do_stand(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self._current_hand()
+        return self._finish()
+
+    def do_quit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {"bankroll": self.bankroll}
+
+    @staticmethod
+    def _integer(request: Dict[str, Any], field: str, default: int) -> int:
+        """a field that must be a JSON integer; int() would accept "3" and 2.5 and fail on 1e400 (inf)
+        with an OverflowError, which would drop the connection"""
+        value = request.get(field, default)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ProtocolError(f"{field} must be an integer")
+        return value
+
+    def _current_table(self) -> Table:
+        if self.table is None:
+            raise ProtocolError("join a table first")
+        return self.table
+
+    def _current_hand(self) -> Hand:
+        if self.hand is None:
+            raise ProtocolError("place a bet first")
+        return self.hand
+
+    def _finish(self) -> Dict[str, Any]:
+        table, hand = self._current_table(), self._current_hand()
+        win = table.settle(hand, self.bet, self.hole_card)
+        self.bankroll += win
+        response = self._state(done=True, win=win, bankroll=self.bankroll)
+        self.hand = self.hole_card = None
+        return response
+
+    def _state(self, done: bool = False, **extra: Any) -> Dict[str, Any]:
+        hand = self._current_hand()
+        return dict(cards=[str(c) for c in hand.cards], total=hand.total(), done=done, **extra)
+
+
+class TableServer:
+    """hosts `tables` Table objects and serves any number of sessions on one event loop"""
+
+    def __init__(self, tables: int = 64, func=make_card) -> None:
+        self.tables = [Table(func=func) for _ in range(tables)]
+        self.sessions = 0  # number of currently connected sessions
+        self.requests = 0  # number of handled requests, for a rough throughput on the server side
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """one coroutine per connection: reads a line, answers a line, until the client quits"""
+        session = Session(self)
+        self.sessions += 1
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    response = {"ok": True, **session.handle(request)}
+                except (ProtocolError, ValueError, TypeError) as e:
+                    request, response = {}, {"ok": False, "error": str(e)}
+                self.requests += 1
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+                if request.get("action") == "quit":
+                    break
+        except ConnectionError:
+            pass  # client went away, the session is simply dropped
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 8765, path: Optional[str] = None
+    ) -> asyncio.AbstractServer:
+        """listens on a Unix socket if a path is given, otherwise on TCP"""
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path=path, backlog=4096)
+        return await asyncio.start_server(self.handle_connection, host=host, port=port, backlog=4096)
+
+
+# Client harness
+# --------------
+# Each session is one coroutine with its own connection; all of them run concurrently on the
+# client's event loop. The latency of every request is recorded per action.
+
+class Client:
+    """async client for one session; a very small bot plays the hands (hit below `hit_below`)"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 latencies: DefaultDict[str, List[float]]) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+
+    @classmethod
+    async def connect(cls, latencies: DefaultDict[str, List[float]], host: str = "127.0.0.1",
+                      port: int = 8765, path: Optional[str] = None) -> "Client":
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, latencies)
+
+    async def request(self, action: str, **kw: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        self.writer.write(json.dumps(dict(action=action, **kw)).encode() + b"\n")
+        await self.writer.drain()
+        response = json.loads(await self.reader.readline())
+        self.latencies[action].append(time.perf_counter() - start)
+        if not response["ok"]:
+            raise ProtocolError(response["error"])
+        return response
+
+    async def play(self, table: int, rounds: int, hit_below: int = 17) -> int:
+        await self.request("join", table=table)
+        for _ in range(rounds):
+            state = await self.request("bet", amount=1)
+            while not state["done"]:
+                if state["total"] < hit_below:
+                    state = await self.request("hit")
+                else:
+                    state = await self.request("stand")
+        bankroll = (await self.request("quit"))["bankroll"]
+        self.writer.close()
+        return bankroll
+
+
+def percentile(ordered: Sequence[float], p: float) -> float:
+    """nearest-rank percentile of an already sorted sequence"""
+    if not ordered:
+        return math.nan
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+async def stress(sessions: int = 1000, rounds: int = 10, tables: int = 64,
+                 host: str = "127.0.0.1", port: int = 8765, path: Optional[str] = None) -> Dict[str, Any]:
+    """drives `sessions` concurrent sessions against a server and reports latency percentiles
+    per action (in milliseconds) and the overall throughput (requests per second)"""
+    latencies: DefaultDict[str, List[float]] = defaultdict(list)
+
+    async def one_session(i: int) -> int:
+        client = await Client.connect(latencies, host=host, port=port, path=path)
+        return await client.play(table=i % tables, rounds=rounds)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    report: Dict[str, Any] = {"sessions": sessions, "seconds": elapsed}
+    total = 0
+    for action, values in sorted(latencies.items()):
+        values.sort()
+        total += len(values)
+        report[action] = {
+            "count": len(values),
+            **{f"p{p}": 1000 * percentile(values, p) for p in (50, 90, 99, 99.9)},
+        }
+    report["requests"] = total
+    report["throughput"] = total / elapsed
+    return report
+
+
+async def serve_and_stress(sessions: int, rounds: int, tables: int,
+                           port: int, path: Optional[str]) -> Dict[str, Any]:
+    """runs server and harness on the same event loop, which is handy for a localhost benchmark"""
+    server = await TableServer(tables=tables).start(port=port, path=path)
+    async with server:
+        return await stress(sessions, rounds, tables, port=port, path=path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("asyncio blackjack table server and stress-test harness")
+    parser.add_argument("mode", choices=["serve", "stress", "both"], help="run the server, the harness or both")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port on localhost")
+    parser.add_argument("--unix", type=str, default=None, help="path of a Unix socket, used instead of TCP")
+    parser.add_argument("--tables", type=int, default=64, help="number of tables")
+    parser.add_argument("--sessions", type=int, default=1000, help="number of concurrent sessions")
+    parser.add_argument("--rounds", type=int, default=10, help="hands played per session")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        async def serve() -> None:
+            server = await TableServer(tables=args.tables).start(port=args.port, path=args.unix)
+            async with server:
+                await server.serve_forever()
+        asyncio.run(serve())
+    else:
+        if args.mode == "stress":
+            coroutine = stress(args.sessions, args.rounds, args.tables, port=args.port, path=args.unix)
+        else:
+            coroutine = serve_and_stress(args.sessions, args.rounds, args.tables, args.port, args.unix)
+        print(json.dumps(asyncio.run(coroutine), indent=4))
+
+# can be run with `python -m mastering_oop.strategies.table_server both --sessions 2000`
@@ -0,0 +1,338 @@
+import io
+import pickle
+import random
+
+from mastering_oop.cards.card_factory_class import make_card
+from mastering_oop.cards.suit import Suit
+from mastering_oop.hands.hand import Hand
+from mastering_oop.strategies.binary_search_tree_from_set import Tree
+from mastering_oop.strategies.binary_search_tree_node_pool import PooledTree
+from mastering_oop.strategies.sorted_blocks_tree import SortedBlocksTree
+
+
+def check_avl(node):
+    """returns the height of the subtree and asserts the AVL invariants on the way"""
+    if node is None:
+        return 0
+    height_less, height_more = check_avl(node.less), check_avl(node.more)
+    assert abs(height_less - height_more) <= 1
+    assert node.height == 1 + max(height_less, height_more)
+    for child in (node.less, node.more):
+        if child is not None:
+            assert child.parent is node
+    return node.height
+
+
+def test_balanced_tree_stays_shallow_for_sorted_input():
+    tree = Tree(range(1, 10001), balanced=True)
+    assert check_avl(tree.root.more) <= 15
+    assert len(tree) == 10000
+    assert 5000 in tree and 0 not in tree
+
+
+def test_balanced_tree_random_add_and_discard():
+    rng = random.Random(1)
+    tree, reference = Tree(balanced=True, multiset=True), []
+    for _ in range(5000):
+        x = rng.randrange(1, 500)
+        if rng.random() < 0.6:
+            tree.add(x)
+            reference.append(x)
+        else:
+            tree.discard(x)
+            if x in reference:
+                reference.remove(x)
+    check_avl(tree.root.more)
+    assert list(tree) == sorted(reference) and len(tree) == len(reference)
+    assert check_sizes(tree.root.more) == len(reference)
+
+
+def test_unbalanced_tree_deeper_than_the_recursion_limit():
+    tree = Tree()
+    for x in range(3000):  # sorted adds: a linked list of 3000 nodes (the bulk build would balance it)
+        tree.add(x)
+    assert tree.root.more.subtree_size == 3000 and tree.root.more.less is None
+    assert repr(tree.root.more).startswith("TreeNode(0, None, TreeNode(1, None, ")
+    assert repr(tree.root.more).endswith("TreeNode(2999, None, None)" + ")" * 2999)
+    assert list(tree) == list(range(3000))  # includes the falsy item 0
+    assert 2999 in tree and 3000 not in tree
+    for x in range(0, 3000, 2):
+        tree.remove(x)
+    assert list(tree) == list(range(1, 3000, 2))
+
+
+def test_bulk_build_is_balanced_for_any_input_order():
+    items = list(range(1000))
+    random.Random(2).shuffle(items)
+    for source in (range(1000), items, reversed(range(1000))):
+        tree = Tree(source, balanced=True)
+        assert check_avl(tree.root.more) == 10
+        assert len(tree) == 1000 and list(tree) == list(range(1000))
+        tree.add(1000)
+        tree.discard(0)
+        assert len(tree) == 1000 and check_avl(tree.root.more) <= 11
+
+
+def check_sizes(node):
+    if node is None:
+        return 0
+    size = node.count + check_sizes(node.less) + check_sizes(node.more)
+    assert node.subtree_size == size
+    return size
+
+
+def test_select_and_rank_match_sorted_list():
+    rng = random.Random(4)
+    for balanced in (False, True):
+        tree = Tree(rng.sample(range(1000), 300), balanced=balanced)
+        for _ in range(500):
+            x = rng.randrange(1000)
+            if rng.random() < 0.5:
+                tree.add(x)
+            else:
+                tree.discard(x)
+        reference = list(tree)
+        assert check_sizes(tree.root.more) == len(tree) == len(reference)
+        assert [tree.select(k) for k in range(len(tree))] == reference
+        assert tree[-1] == reference[-1] and tree[0] == reference[0]
+        for x in range(-1, 1001, 7):
+            assert tree.rank(x) == sum(1 for y in reference if y < x)
+
+
+def test_irange_floor_and_ceiling():
+    items = random.Random(5).sample(range(0, 400, 2), 150)
+    reference = sorted(items)
+    for balanced in (False, True):
+        tree = Tree(items, balanced=balanced)
+        assert list(reversed(tree)) == reference[::-1]
+        for lo, hi in ((None, None), (10, 100), (11, 99), (-5, 3), (398, None), (None, 0), (50, 40)):
+            for inclusive in ((True, True), (False, False), (True, False), (False, True)):
+                expected = [
+                    x for x in reference
+                    if (lo is None or (lo <= x if inclusive[0] else lo < x))
+                    and (hi is None or (x <= hi if inclusive[1] else x < hi))
+                ]
+                assert list(tree.irange(lo, hi, inclusive)) == expected
+                assert list(tree.irange(lo, hi, inclusive, reverse=True)) == expected[::-1]
+        for x in range(-3, 403):
+            assert tree.floor(x) == max((y for y in reference if y <= x), default=None)
+            assert tree.ceiling(x) == min((y for y in reference if y >= x), default=None)
+
+
+def test_pooled_tree_matches_tree_and_reuses_free_nodes():
+    for multiset in (False, True):
+        rng = random.Random(6)
+        items = rng.sample(range(500), 200)
+        tree, pooled = Tree(items, multiset=multiset), PooledTree(items, multiset=multiset)
+        for _ in range(3000):
+            x = rng.randrange(500)
+            if rng.random() < 0.5:
+                tree.add(x)
+                pooled.add(x)
+            else:
+                tree.discard(x)
+                pooled.discard(x)
+            assert (x in tree) == (x in pooled)
+        assert list(pooled) == list(tree) and len(pooled) == len(tree)
+        assert len(pooled._items) < len(items) + 3000 // 2  # freed nodes were reused
+    assert PooledTree([1, 1, 2]) == Tree([1, 1, 2]) and len(PooledTree([1, 1, 2])) == 2
+    assert list(PooledTree([1, 1, 2], multiset=True)) == list(Tree([1, 1, 2], multiset=True))
+
+
+def test_set_algebra_between_trees():
+    rng = random.Random(7)
+    a, b = set(rng.sample(range(300), 120)), set(rng.sample(range(300), 150))
+    for balanced in (False, True):
+        ta, tb = Tree(a, balanced=balanced), Tree(b, balanced=balanced)
+        assert list(ta | tb) == sorted(a | b)
+        assert list(ta & tb) == sorted(a & b)
+        assert list(ta - tb) == sorted(a - b)
+        assert list(ta ^ tb) == sorted(a ^ b)
+        assert list(ta | [1000, 1001]) == sorted(a | {1000, 1001})  # not a Tree: mixin fallback
+        result = ta | tb
+        assert len(result) == len(a | b) and check_sizes(result.root.more) == len(result)
+        if balanced:
+            check_avl(result.root.more)
+        ta ^= tb
+        assert list(ta) == sorted(a ^ b) and len(ta) == len(a ^ b)
+        ta -= ta
+        assert list(ta) == [] and len(ta) == 0
+
+
+def test_set_algebra_mixin_fallback_keeps_the_mode_and_key():
+    tree = Tree(["b", "A"], key=str.lower, multiset=True, balanced=True)
+    for result in (tree | ["a", "b"], tree & ["A", "B"], tree - ["B"], tree ^ ["c"]):
+        assert (result.key, result.multiset, type(result.root).__name__) == (str.lower, True, "AVLTreeNode")
+    assert sorted(tree | ["a", "b"], key=str.lower) == ["A", "a", "b", "b"]  # the duplicate is counted
+    assert (tree | ["a", "b"]).count("b") == 2
+    assert list(tree & ["A", "B"]) == ["A"] and list(tree - ["B"]) == ["A", "b"]
+    assert list(tree ^ ["c"]) == ["A", "b", "c"]
+    other = Tree(["a"], key=str.upper)  # a different key: not mergeable, so the mixins are used
+    assert (tree | other).key is str.lower
+
+
+def test_sorted_blocks_tree_matches_tree():
+    for multiset in (False, True):
+        rng = random.Random(8)
+        items = rng.sample(range(500), 200)
+        tree = Tree(items, multiset=multiset)
+        blocks = SortedBlocksTree(items, load=4, multiset=multiset)  # small blocks to split and drop often
+        for _ in range(3000):
+            x = rng.randrange(500)
+            if rng.random() < 0.5:
+                tree.add(x)
+                blocks.add(x)
+            else:
+                tree.discard(x)
+                blocks.discard(x)
+            assert (x in tree) == (x in blocks)
+        assert list(blocks) == list(tree) and len(blocks) == len(tree)
+        assert list(reversed(blocks)) == list(reversed(tree))
+        assert all(len(block) <= 8 for block in blocks._blocks)
+        assert blocks._maxes == [block[-1] for block in blocks._blocks]
+    assert SortedBlocksTree([1, 1, 2]) == Tree([1, 1, 2]) and len(SortedBlocksTree([1, 1, 2])) == 2
+    assert list(SortedBlocksTree([1, 1, 2], multiset=True)) == list(Tree([1, 1, 2], multiset=True))
+
+
+def test_key_is_computed_once_per_item():
+    calls = []
+
+    def key(word):
+        calls.append(word)
+        return word.lower()
+
+    words = ["b", "A", "c", "a", "B", "d"]
+    for balanced in (False, True):
+        calls.clear()
+        tree = Tree(words, balanced=balanced, key=key)
+        assert len(calls) == len(words)
+        assert [word.lower() for word in tree] == sorted(word.lower() for word in words)
+        for word in ["e", "E", "C"]:
+            calls.clear()
+            tree.add(word)
+            assert len(calls) == 1
+        assert "a" in tree and "A" in tree and "D" not in tree  # equal keys, but different items
+        tree.discard("A")
+        assert "A" not in tree and "a" in tree
+        assert tree.floor("BB") in ("b", "B") and tree.rank("C") == 3
+        assert sorted(tree.irange("b", "c")) == ["B", "C", "b", "c"]
+        other = Tree(["a", "Z"], balanced=balanced, key=key)
+        assert sorted(tree | other) == sorted(set(tree) | {"Z"})
+        assert sorted(tree & other) == ["a"]
+        assert check_sizes((tree - other).root.more) == len(tree) - 1
+
+
+def test_key_that_returns_the_item_itself_or_none():
+    def fives(x):
+        return x // 5  # 0 // 5 is the cached small int 0 itself
+
+    def nothing(x):
+        return None
+
+    for balanced in (False, True):
+        tree = Tree([3], balanced=balanced, key=fives)
+        assert 0 not in tree and tree.count(0) == 0
+        tree.add(0)
+        assert sorted(tree) == [0, 3] and len(tree) == 2
+        tree.discard(0)
+        assert list(tree) == [3] and 0 not in tree
+        tree.add(1)
+        tree.add(0)
+        assert sorted(tree) == [0, 1, 3] and tree.count(1) == 1
+
+        built, added = Tree(["a"], balanced=balanced, key=nothing), Tree(balanced=balanced, key=nothing)
+        added.add("a")
+        for tree in (built, added):  # None can't be ordered, but a single item can still have it as its key
+            assert [node.key for node in tree._nodes()] == [None] and list(tree) == ["a"]
+
+
+def test_hands_of_the_same_total_without_a_key():
+    dealer = make_card(13, Suit.Club)
+    spades = {rank: make_card(rank, Suit.Spade) for rank in range(1, 14)}  # cards are only == to themselves
+    hearts = {rank: make_card(rank, Suit.Heart) for rank in range(1, 14)}
+
+    def hand(*ranks):
+        return Hand(dealer, spades[ranks[0]], *(hearts[r] for r in ranks[1:]))
+
+    seventeens = [hand(10, 7), hand(9, 8), hand(10, 5, 2)]  # neither less nor more than each other, but not ==
+    for balanced in (False, True):
+        tree = Tree([seventeens[0], hand(2, 3)], balanced=balanced)
+        for h in seventeens[1:]:
+            assert h not in tree
+            tree.add(h)
+            assert h in tree and tree.count(h) == 1
+        tree.add(hand(9, 8))
+        assert len(tree) == 4 and all(h in tree for h in seventeens)
+        tree.discard(hand(9, 8))
+        assert len(tree) == 3 and seventeens[1] not in tree and seventeens[2] in tree
+
+        built = Tree([*seventeens, hand(9, 8), hand(10, 7)], balanced=balanced)
+        assert len(built) == 3 and all(node.key is node.item for node in built._nodes())
+        multi = Tree([*seventeens, hand(9, 8)], balanced=balanced, multiset=True)
+        assert len(multi) == 4 and multi.count(hand(9, 8)) == 2
+        assert len(built | Tree([hand(9, 8), hand(3, 4)])) == 4 and len(built & Tree([hand(9, 8)])) == 1
+
+    for backend in (PooledTree, lambda items: SortedBlocksTree(items, load=2)):
+        other = backend([hand(2, 3), seventeens[0], hand(2, 4), hand(2, 5)])
+        for h in seventeens[1:]:
+            assert h not in other
+            other.add(h)
+        other.add(hand(9, 8))
+        assert len(other) == 6 and all(h in other for h in seventeens)
+        other.discard(hand(9, 8))
+        assert len(other) == 5 and seventeens[1] not in other and seventeens[2] in other
+        assert len(backend([*seventeens, hand(9, 8), hand(10, 7)])) == 3
+
+
+def test_set_mode_and_multiset_mode():
+    rng = random.Random(9)
+    items = [rng.randrange(20) for _ in range(200)]
+    for balanced in (False, True):
+        tree = Tree(items[:100], balanced=balanced)
+        multi = Tree(items[:100], balanced=balanced, multiset=True)
+        for x in items[100:]:
+            tree.add(x)
+            multi.add(x)
+        assert list(tree) == sorted(set(items)) and len(tree) == len(set(items))
+        assert list(multi) == sorted(items) and len(multi) == len(items)
+        assert sum(1 for _ in multi._nodes()) == len(set(items))  # one node per different item
+        assert multi.count(items[0]) == items.count(items[0]) and tree.count(items[0]) == 1
+        assert [multi[k] for k in range(len(multi))] == sorted(items)
+        assert multi.rank(10) == sum(1 for x in items if x < 10)
+        assert list(multi.irange(5, 6)) == sorted(x for x in items if 5 <= x <= 6)
+        for x in items[:150]:
+            multi.discard(x)
+        assert list(multi) == sorted(items[150:]) and check_sizes(multi.root.more) == 50
+        if balanced:
+            check_avl(multi.root.more)
+        other = Tree([1, 1, 1, 2], multiset=True)
+        assert list(other | Tree([1, 3, 3], multiset=True)) == [1, 1, 1, 2, 3, 3]
+        assert list(other - Tree([1, 2], multiset=True)) == [1, 1]
+        assert list(Tree([1, 1, 2]) | Tree([1, 3])) == [1, 2, 3]
+
+
+def test_pickle_dump_and_load_rebuild_the_tree():
+    deep = Tree()
+    for x in range(1500):  # sorted input: a linked list deeper than the recursion limit
+        deep.add(x)
+    copy = pickle.loads(pickle.dumps(deep))
+    assert list(copy) == list(deep) and len(copy) == 1500
+    assert copy.root.more.subtree_size == 1500 and copy._shape() != deep._shape()  # rebuilt balanced
+
+    rng = random.Random(12)
+    items = [rng.randrange(100) for _ in range(500)]
+    for tree in (deep, Tree(items, balanced=True, multiset=True), Tree(["b", "A", "a"], key=str.lower)):
+        for x in items[:50] if tree.key is None else ["A"]:  # a shape that isn't the balanced one
+            tree.discard(x)
+        file = io.BytesIO()
+        tree.dump(file, shape=True)
+        file.seek(0)
+        loaded = Tree.load(file)
+        assert list(loaded) == list(tree) and len(loaded) == len(tree)
+        assert loaded._shape() == tree._shape() and loaded.root.more.subtree_size == len(tree)
+        assert (loaded.key, loaded.multiset) == (tree.key, tree.multiset)
+        assert isinstance(loaded.root, type(tree.root))
+        if tree.multiset:
+            check_avl(loaded.root.more)
+            check_sizes(loaded.root.more)
+            assert loaded.count(items[-1]) == tree.count(items[-1])
@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+
+from mastering_oop.strategies.concurrent_tree import ConcurrentTree, ReadWriteLock
+
+
+def check_avl(node):
+    """returns the height of the subtree and asserts the AVL property, the cached heights and sizes"""
+    if node is None:
+        return 0
+    less, more = check_avl(node.less), check_avl(node.more)
+    assert abs(less - more) <= 1
+    assert node.height == 1 + max(less, more)
+    assert node.size == 1 + (node.less.size if node.less else 0) + (node.more.size if node.more else 0)
+    return node.height
+
+
+def test_concurrent_tree_matches_set():
+    rng = random.Random(10)
+    tree, reference = ConcurrentTree(rng.sample(range(500), 100)), set()
+    reference.update(tree)
+    for _ in range(3000):
+        x = rng.randrange(500)
+        if rng.random() < 0.5:
+            tree.add(x)
+            reference.add(x)
+        else:
+            tree.discard(x)
+            reference.discard(x)
+        assert (x in tree) == (x in reference)
+    check_avl(tree._root)
+    assert list(tree) == sorted(reference) and len(tree) == len(reference)
+    assert list(reversed(tree)) == sorted(reference, reverse=True)
+    assert tree.pop() == min(reference)
+
+
+def test_iterators_and_snapshots_keep_their_version():
+    tree = ConcurrentTree(range(10))
+    snapshot, iterator = tree.snapshot(), iter(tree)
+    assert next(iterator) == 0
+    tree.update(range(10, 20))
+    tree.discard(5)
+    assert list(iterator) == list(range(1, 10))
+    assert list(snapshot) == list(range(10)) and 5 in snapshot and len(snapshot) == 10
+    assert 5 not in tree and len(tree) == 19
+
+
+def test_readers_see_consistent_snapshots_while_a_writer_inserts():
+    tree = ConcurrentTree()
+    items = list(range(5000))
+    random.Random(11).shuffle(items)
+    done = threading.Event()
+    errors = []
+
+    def write():
+        for x in items:
+            tree.add(x)
+        done.set()
+
+    def read():
+        while not done.is_set():
+            snapshot = tree.snapshot()
+            seen = list(snapshot)
+            if len(seen) != len(snapshot) or any(a >= b for a, b in zip(seen, seen[1:])):
+                errors.append(seen)
+
+    threads = [threading.Thread(target=read) for _ in range(3)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert list(tree) == sorted(items)
+    check_avl(tree._root)
+
+
+def test_read_write_lock_excludes_writers_while_reading():
+    lock, events = ReadWriteLock(), []
+    lock.acquire_read()
+
+    def write():
+        with lock.write_locked():
+            events.append("write")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    time.sleep(0.05)
+    events.append("read done")
+    lock.release_read()
+    writer.join()
+    assert events == ["read done", "write"]
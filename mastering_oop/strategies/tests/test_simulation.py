@@ -0,0 +1,46 @@
+import random
+
+from mastering_oop.strategies.simulation import Simulation, StoppingRule
+
+
+def test_resume_from_checkpoint_gives_same_results(tmp_path):
+    uninterrupted = Simulation(players=2, seed=1).run(2000).results()
+
+    checkpoint = tmp_path / "simulation.pickle"
+    Simulation(players=2, seed=1).run(700, checkpoint=checkpoint)
+    resumed = Simulation.load(checkpoint).run(2000).results()
+
+    assert resumed == uninterrupted
+
+
+def test_simulations_have_their_own_random_number_generator(tmp_path):
+    alone = Simulation(players=1, seed=3).run(1500).results()
+
+    random.seed(99)
+    first, second = Simulation(players=1, seed=3), Simulation(players=1, seed=4)
+    for rounds in range(100, 1501, 100):  # interleaved with another simulation and other random draws
+        first.run(rounds)
+        second.run(rounds)
+        random.random()
+    assert first.results() == alone
+
+    checkpoint = tmp_path / "simulation.pickle"
+    Simulation(players=1, seed=3).run(600, checkpoint=checkpoint)
+    state = random.getstate()
+    resumed = Simulation.load(checkpoint)
+    assert random.getstate() == state  # loading leaves the global generator alone
+    assert resumed.table.rng is resumed.random
+    assert resumed.run(1500).results() == alone
+
+
+def test_run_until_stops_when_the_interval_is_narrow_enough():
+    rule = StoppingRule(width=0.2, min_hands=500)
+    simulation = Simulation(players=2, seed=2).run_until(rule, batch=250)
+    low, high = rule.interval(simulation)
+    assert high - low < 0.2 and simulation.stats.count >= 500 and simulation.rounds % 250 == 0
+    # one batch less wasn't enough
+    shorter = Simulation(players=2, seed=2).run(simulation.rounds - 250)
+    assert not rule.done(shorter)
+
+    capped = Simulation(players=2, seed=2).run_until(StoppingRule(width=0.001), batch=300, max_rounds=1000)
+    assert capped.rounds == 1000
@@ -0,0 +1,275 @@
+import bisect
+import contextlib
+import io
+import math
+import random
+import statistics
+
+import pytest
+
+from mastering_oop.strategies.grouped_stats import GroupedStats
+from mastering_oop.strategies.rolling_stats_list import RollingStatsList
+from mastering_oop.strategies.running_stats import RunningStats
+from mastering_oop.strategies.sketches import FixedBinHistogram, KLLSketch, LogBinHistogram, SketchedStatsList
+from mastering_oop.strategies.stats_list_mmap import StatsListMemoryMapped
+from mastering_oop.strategies.stats_list_numpy import StatsListNumPy
+
+with contextlib.redirect_stdout(io.StringIO()):  # the module prints its try-out section
+    from mastering_oop.strategies.customized_sequence_from_list import (
+        StatsListEager,
+        StatsListLazy,
+        StatsListWithItemGetterSetterDeleter,
+        StatsListWrappingList,
+    )
+
+
+def test_numpy_stats_list_behaves_like_a_list():
+    rng = random.Random(13)
+    values = [rng.uniform(-100, 100) for _ in range(100)]
+    stats_list, reference = StatsListNumPy(values[:10]), values[:10]
+    stats_list.extend(iter(values[10:50]))  # a generator is consumed once
+    reference.extend(values[10:50])
+    for value in values[50:]:
+        stats_list.append(value)
+        reference.append(value)
+    for index in (slice(None), slice(5, 20), slice(None, None, -3), slice(90, 200)):
+        assert stats_list[index] == reference[index]
+    assert stats_list[-1] == reference[-1] and len(stats_list) == len(reference)
+    for index, new in ((slice(2, 5), [1.0]), (slice(10, 10), [2.0, 3.0]), (slice(0, 20, 2), [4.0] * 10)):
+        stats_list[index] = new
+        reference[index] = new
+    for index in (3, slice(0, 9, 4), slice(-5, None)):
+        del stats_list[index]
+        del reference[index]
+    stats_list.insert(7, 5.0)
+    reference.insert(7, 5.0)
+    assert stats_list.pop() == reference.pop() and stats_list.pop(0) == reference.pop(0)
+    assert stats_list == reference and list(stats_list) == reference
+    assert stats_list.mean == pytest.approx(statistics.fmean(reference))
+    assert stats_list.stdev == pytest.approx(statistics.pstdev(reference))
+    assert (stats_list.min, stats_list.max) == (min(reference), max(reference))
+    with pytest.raises(IndexError):
+        stats_list[len(reference)]
+    with pytest.raises(ValueError):
+        stats_list[::2] = [1.0]
+
+
+def moments(values):
+    n = len(values)
+    mean = math.fsum(values) / n
+    return [n, mean] + [math.fsum((x - mean) ** k for x in values) for k in (2, 3, 4)]
+
+
+def test_running_stats_match_the_exact_moments_and_merge():
+    rng = random.Random(14)
+    values = [1e9 + rng.expovariate(0.1) for _ in range(1000)]  # huge mean, small spread
+    stats = RunningStats.from_values(values)
+    n, mean, m2, m3, m4 = moments(values)
+    assert stats.count == n and stats.mean == pytest.approx(mean, rel=1e-15)
+    assert (stats.m2, stats.m3, stats.m4) == pytest.approx((m2, m3, m4), rel=1e-6)
+    assert stats.stdev == pytest.approx(statistics.pstdev(values), rel=1e-9)
+    assert (stats.min, stats.max) == (min(values), max(values))
+
+    parts = [RunningStats.from_values(values[i:i + 97]) for i in range(0, 1000, 97)]
+    merged = RunningStats()
+    for part in parts:
+        merged.merge(part)
+    assert merged.count == n and merged.mean == pytest.approx(mean, rel=1e-15)
+    assert (merged.m2, merged.m3, merged.m4) == pytest.approx((m2, m3, m4), rel=1e-6)
+    assert (merged.min, merged.max) == (stats.min, stats.max)
+
+    for value in values[500:]:
+        stats.remove(value)
+    assert stats.count == 500
+    assert (stats.mean, stats.m2, stats.m3, stats.m4) == pytest.approx(moments(values[:500])[1:], rel=1e-6)
+    assert math.isnan(stats.max) or stats.max == max(values[:500])
+    for value in values[:500]:
+        stats.remove(value)
+    assert stats == RunningStats()
+
+
+def test_stats_lists_use_the_accumulator():
+    values = [1e9 + x for x in (4.0, 7.0, 13.0, 16.0)]
+    eager = StatsListWithItemGetterSetterDeleter(values)
+    wrapping = StatsListWrappingList()
+    for value in values:
+        wrapping.append(value)
+    for stats_list in (StatsListLazy(values), eager, wrapping, StatsListNumPy(values)):
+        assert stats_list.stdev == pytest.approx(math.sqrt(22.5))  # the old sums gave 0.0 here
+    eager[0] = 1e9 + 10.0
+    del eager[1:3]
+    assert eager.stdev == pytest.approx(3.0) and eager.sum0 == 2 and eager.sum1 == pytest.approx(2e9 + 26.0)
+    assert StatsListNumPy(values).stats.m2 == pytest.approx(90.0)
+
+
+def test_rolling_stats_list_follows_the_last_values():
+    rng = random.Random(15)
+    values = [rng.choice([-1.0, 1.0, 1.5]) * rng.uniform(0, 100) for _ in range(2000)]
+    window = RollingStatsList(50)
+    for i, value in enumerate(values):
+        window.append(value)
+        recent = values[max(0, i - 49):i + 1]
+        assert list(window) == recent and len(window) == len(recent) and window[-1] == value
+        assert window.mean == pytest.approx(statistics.fmean(recent))
+        assert window.variance == pytest.approx(statistics.pvariance(recent), rel=1e-6, abs=1e-9)
+        assert (window.min, window.max) == (min(recent), max(recent))
+    for _ in range(49):
+        assert window.popleft() == recent.pop(0)
+        assert (window.min, window.max) == (min(recent), max(recent))
+        assert window.mean == pytest.approx(statistics.fmean(recent))
+    assert window[:] == recent
+
+
+def test_sketches_meet_their_error_bounds_and_merge():
+    rng = random.Random(16)
+    values = [rng.choice([-1, 1, 1, 2]) * rng.lognormvariate(0, 1) for _ in range(40_000)]
+    exact = sorted(values)
+    kll = [KLLSketch(seed=i) for i in range(4)]
+    log = [LogBinHistogram(relative_accuracy=0.01) for _ in range(4)]
+    fixed = [FixedBinHistogram(-10, 10, bins=200) for _ in range(4)]
+    for i in range(4):  # four partitions, merged afterwards
+        for sketch in (kll[i], log[i], fixed[i]):
+            sketch.update(values[i::4])
+    for sketches in (kll, log, fixed):
+        for other in sketches[1:]:
+            sketches[0].merge(other)
+        assert sketches[0].count == len(values)
+    assert sum(len(items) for items in kll[0].compactors) < 2000  # instead of 40000
+    for q in (0.01, 0.5, 0.95, 0.99):
+        truth = exact[int(q * (len(values) - 1))]
+        rank = bisect.bisect_left(exact, kll[0].quantile(q)) / len(values)
+        assert abs(rank - q) < 0.0165
+        assert abs(log[0].quantile(q) - truth) <= 0.01 * abs(truth) + 1e-12
+        if -10 <= truth < 10:
+            assert abs(fixed[0].quantile(q) - truth) <= fixed[0].width
+
+    small = LogBinHistogram(max_bins=200)  # collapses the smallest magnitudes, the upper tail is kept exact
+    small.update(values)
+    truth = exact[int(0.99 * (len(values) - 1))]
+    assert len(small.positive) <= 200 and len(small.negative) <= 200
+    assert abs(small.quantile(0.99) - truth) <= 0.01 * truth
+
+
+def test_sketches_attach_to_stats_lists():
+    wrapping = StatsListWrappingList()
+    wrapping.append(1.0)
+    wrapping.append(2.0)
+    for stats_list in (StatsListEager([1.0, 2.0]), StatsListNumPy([1.0, 2.0]), wrapping, RollingStatsList(200, [1.0, 2.0])):
+        sketched = SketchedStatsList(stats_list, kll=KLLSketch(), log=LogBinHistogram())
+        sketched.extend(float(x) for x in range(3, 101))  # a generator goes into the list and both sketches
+        sketched.append(101.0)
+        assert len(sketched) == 101 and sketched[-1] == 101.0 and sketched.mean == pytest.approx(51.0)
+        assert sketched.quantile(0.5) == 51.0
+        assert sketched.quantile(0.5, "log") == pytest.approx(51.0, rel=0.01)
+
+
+def test_slice_mutation_consumes_iterables_once_and_keeps_the_stats():
+    rng = random.Random(45)
+    stats_list = StatsListWithItemGetterSetterDeleter([rng.uniform(-5, 5) for _ in range(200)])
+    expected = list(stats_list)
+    edits = [
+        (slice(10, 20), lambda: (x * 2.0 for x in range(15))),  # grows, from a generator
+        (slice(50, 40), lambda: iter([1.5, 2.5])),  # an empty slice inserts
+        (slice(None, None, 7), lambda: (float(x) for x in range(len(expected[::7])))),
+        (slice(-1, 5, -3), lambda: map(float, range(len(expected[-1:5:-3])))),
+        (slice(3, 190), lambda: (x for x in [9.0, 8.0])),  # most values replaced: recomputed
+    ]
+    for index, make in edits:
+        stats_list[index] = make()
+        expected[index] = list(make())
+        assert list(stats_list) == expected
+        assert stats_list.mean == pytest.approx(statistics.fmean(expected))
+        assert stats_list.stdev == pytest.approx(statistics.pstdev(expected))
+    with pytest.raises(ValueError):
+        stats_list[::2] = iter([1.0])
+    assert stats_list.stats.count == len(expected)
+
+    stats_list.extend(float(x) for x in range(100))
+    stats_list += (float(x) for x in range(-3, 0))
+    del stats_list[5:60:2]
+    del stats_list[::-4]
+    expected.extend(float(x) for x in range(100))
+    expected.extend(float(x) for x in range(-3, 0))
+    del expected[5:60:2]
+    del expected[::-4]
+    assert list(stats_list) == expected
+    assert stats_list.sum0 == len(expected)
+    assert stats_list.mean == pytest.approx(statistics.fmean(expected))
+    assert stats_list.stdev == pytest.approx(statistics.pstdev(expected))
+    assert isinstance(stats_list + [1.0], StatsListWithItemGetterSetterDeleter)
+
+
+def test_wrapping_list_exports_its_buffer():
+    import struct
+
+    import numpy as np
+
+    stats_list = StatsListWrappingList()
+    for value in (1.0, 4.0, 3.0):
+        stats_list.append(value)
+    assert len(stats_list) == 3
+    shared = np.asarray(stats_list)  # no copy: a view of the array's memory
+    shared[0] = 2.0
+    assert stats_list[0] == 2.0 and struct.unpack_from("3d", stats_list) == (2.0, 4.0, 3.0)
+    with pytest.raises(BufferError):
+        stats_list.append(5.0)  # the array can't be resized while it's exported
+    del shared
+
+    loaded = StatsListWrappingList()
+    loaded.append(0.0)
+    loaded.frombytes(stats_list.tobytes())
+    assert list(loaded) == [0.0, 2.0, 4.0, 3.0] and bytes(loaded) == loaded.tobytes()
+    assert loaded.mean == pytest.approx(2.25) and loaded.stdev == pytest.approx(statistics.pstdev([0, 2, 4, 3]))
+    loaded.frombytes(b"")
+    loaded.append(1.0)  # no export of the array is left behind by frombytes()
+    assert loaded.stats.count == 5 and loaded.mean == pytest.approx(2.0) and (loaded.stats.min, loaded.stats.max) == (0.0, 4.0)
+
+
+def test_memory_mapped_stats_list_reopens_from_its_header(tmp_path):
+    rng = random.Random(47)
+    values = [rng.gauss(100, 3) for _ in range(2500)]
+    path = tmp_path / "series.stats"
+    with StatsListMemoryMapped(path, buffer_size=1000) as stats_list:
+        stats_list.extend(values[:2300])
+        assert path.stat().st_size == 64 + 8 * 2000  # two buffers written, 300 values still in memory
+        assert len(stats_list) == 2300 and stats_list[-1] == values[2299] and stats_list[1999] == values[1999]
+        assert stats_list.mean == pytest.approx(statistics.fmean(values[:2300]))
+
+    with StatsListMemoryMapped(path) as stats_list:
+        assert len(stats_list) == 2300 and stats_list.stats.count == 2300
+        assert stats_list.stdev == pytest.approx(statistics.pstdev(values[:2300]))
+        stats_list += values[2300:]
+        assert list(stats_list) == values and stats_list[10:13].tolist() == values[10:13]
+        cached = stats_list.stats.copy()
+        recomputed = stats_list.recompute(chunk_size=300)
+        assert (recomputed.count, recomputed.min, recomputed.max) == (2500, min(values), max(values))
+        assert (recomputed.mean, recomputed.m2, recomputed.m4) == pytest.approx((cached.mean, cached.m2, cached.m4))
+
+    (tmp_path / "other").write_bytes(b"not a stats list")
+    with pytest.raises(ValueError):
+        StatsListMemoryMapped(tmp_path / "other")
+
+
+def test_grouped_stats_match_a_stats_list_per_group():
+    rng = random.Random(48)
+    pairs = [(rng.choice("AKQ23"), rng.gauss(len("AKQ23") * 10, 4)) for _ in range(3000)]
+    per_key = {}
+    for key, value in pairs:
+        per_key.setdefault(key, []).append(value)
+    partitions = [GroupedStats([k for k, _ in pairs[i::3]], [v for _, v in pairs[i::3]]) for i in range(3)]
+    grouped = partitions[0] + partitions[1]
+    grouped.merge(partitions[2])
+    grouped.add([], [])
+    assert list(grouped) == sorted(per_key) and len(partitions[0]["A"]) < len(grouped["A"])
+    for key, values in per_key.items():
+        group, expected = grouped[key], StatsListEager(values)
+        assert len(group) == group.sum0 == expected.sum0
+        assert (group.mean, group.stdev, group.sum1, group.sum2) == pytest.approx(
+            (expected.mean, expected.stdev, expected.sum1, expected.sum2)
+        )
+        assert (group.min, group.max) == (min(values), max(values))
+    assert grouped.total.count == 3000
+    counts = ", ".join(f"{key!r}: {len(values)}" for key, values in sorted(per_key.items()))
+    assert repr(grouped) == f"GroupedStats({counts})" and repr(GroupedStats()) == "GroupedStats()"
+    with pytest.raises(ValueError):
+        grouped.add([1, 2], [1.0])
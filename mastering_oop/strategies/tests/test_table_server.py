@@ -0,0 +1,120 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from mastering_oop.cards.card_factory_class import make_card
+from mastering_oop.cards.suit import Suit
+from mastering_oop.hands.hand import Hand
+from mastering_oop.strategies.table import Table
+from mastering_oop.strategies.table_server import ProtocolError, Session, TableServer, stress
+
+
+def cards(*ranks):
+    return [make_card(rank, Suit.Spade) for rank in ranks]
+
+
+def test_table_deals_hits_and_settles():
+    table = Table(make_card, rng=random.Random(1))
+    hand = table.deal()
+    assert len(hand.cards) == 2 and table.hole_card is not None
+    table.hit(hand)
+    assert len(hand.cards) == 3
+    assert table.dealer_hand(hand).total() >= 17
+
+    king, seven = cards(13, 7)  # the dealer stands on 17, so settling draws no cards
+    for player, win in [((13, 12), 5), ((13, 7), 0), ((13, 6), -5), ((13, 12, 5), -5)]:
+        assert table.settle(Hand(king, *cards(*player)), 5, hole_card=seven) == win
+
+
+def test_session_rejects_requests_that_are_not_allowed():
+    session = Session(TableServer(tables=4))
+    for request, error in [
+        ([1, 2], "a request must be a JSON object"),
+        ({"action": "fold"}, "unknown action 'fold'"),
+        ({"action": "bet"}, "join a table first"),
+        ({"action": "hit"}, "place a bet first"),
+    ]:
+        with pytest.raises(ProtocolError, match=error):
+            session.handle(request)
+
+    assert session.handle({"action": "join", "table": 6}) == {"table": 2, "bankroll": 0}
+    for amount in (0, -1):
+        with pytest.raises(ProtocolError, match="the bet must be positive"):
+            session.handle({"action": "bet", "amount": amount})
+    assert session.hand is None
+
+    state = session.handle({"action": "bet", "amount": 2})
+    assert not state["done"] and len(state["cards"]) == 2
+    for request in ({"action": "join", "table": 1}, {"action": "bet"}):
+        with pytest.raises(ProtocolError, match="finish the current hand first"):
+            session.handle(request)
+    assert session.table is session.server.tables[2]
+
+    state = session.handle({"action": "stand"})
+    assert state["done"] and state["win"] in (-2, 0, 2) and state["bankroll"] == state["win"]
+    assert session.handle({"action": "quit"}) == {"bankroll": state["win"]}
+
+
+def test_line_protocol_answers_errors_and_keeps_the_connection(tmp_path):
+    path = str(tmp_path / "table.sock")
+
+    async def exchange(lines):
+        server = await TableServer(tables=2).start(path=path)
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(path)
+            responses = []
+            for line in lines:
+                writer.write(line + b"\n")
+                await writer.drain()
+                responses.append(json.loads(await reader.readline()))
+            closed = await reader.readline() == b""  # the server hangs up after a quit
+            writer.close()
+            return responses, closed
+
+    responses, closed = asyncio.run(exchange([
+        b"[1, 2]",
+        b"3",
+        b"not json",
+        b'{"action": "join", "table": "x"}',
+        b'{"action": "join", "table": 1e400}',
+        b'{"action": "join", "table": true}',
+        b'{"action": "join", "table": 1}',
+        b'{"action": "bet", "amount": 1e400}',
+        b'{"action": "bet", "amount": 2.5}',
+        b'{"action": "bet", "amount": 0}',
+        b'{"action": "bet", "amount": 1}',
+        b'{"action": "stand"}',
+        b'{"action": "quit"}',
+    ]))
+    errors, (join, huge, fraction, zero, bet, stand, quit) = responses[:6], responses[6:]
+    assert all(not r["ok"] and r["error"] for r in errors)
+    assert errors[0]["error"] == errors[1]["error"] == "a request must be a JSON object"
+    assert errors[3] == errors[4] == errors[5] == {"ok": False, "error": "table must be an integer"}
+    assert huge == fraction == {"ok": False, "error": "amount must be an integer"}
+    assert join == {"ok": True, "table": 1, "bankroll": 0}
+    assert zero == {"ok": False, "error": "the bet must be positive"}
+    assert bet["ok"] and not bet["done"] and "dealer" in bet
+    assert stand["ok"] and stand["done"]
+    assert quit == {"ok": True, "bankroll": stand["bankroll"]}
+    assert closed
+
+
+def test_stress_harness_reports_every_request():
+    async def run():
+        server = await TableServer(tables=4).start(port=0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            return await stress(sessions=20, rounds=3, tables=4, port=port)
+
+    report = asyncio.run(run())
+    assert report["sessions"] == 20
+    assert report["join"]["count"] == report["quit"]["count"] == 20
+    assert report["bet"]["count"] == 60
+    assert report["stand"]["count"] + report.get("hit", {"count": 0})["count"] >= 60
+    assert report["requests"] == sum(report[a]["count"] for a in ("join", "bet", "hit", "stand", "quit") if a in report)
+    for action in ("join", "bet", "quit"):
+        latencies = report[action]
+        assert 0 <= latencies["p50"] <= latencies["p90"] <= latencies["p99"] <= latencies["p99.9"]
+    assert report["throughput"] > 0